@@ -0,0 +1,87 @@
+"""
+Levanta gunicorn con cada perfil de gunicorn.conf.py (y con el comando por defecto de antes,
+un solo worker sync) contra la misma DATABASE_URL y compara el throughput.
+
+    $ DATABASE_URL=postgresql://... python benchmarks/compare_profiles.py --concurrency 32 --duration 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from load import run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ["/characters", "/planets", "/vehicles", "/characters/1", "/favorites/1"]
+# POST /batch con varias lecturas: ejercita el pool paralelo, que con gevent no puede ser de threads
+BATCH_SMOKE = {"requests": [{"path": "/users/1"}, {"path": "/characters/1"}, {"path": "/planets/1"}]}
+
+# (nombre, argumentos extra de gunicorn, variables de entorno)
+# gunicorn carga solo ./gunicorn.conf.py si existe en el cwd (la raiz del repo), asi que la linea
+# base fija todo: sin archivo de configuracion, un worker sync y sin preload, como el comando de antes
+SCENARIOS = [
+    ("default-sync-1", ["--config", "/dev/null", "--worker-class", "sync", "--workers", "1"], {}),
+    ("profile-sync", ["--config", "gunicorn.conf.py"], {"GUNICORN_PROFILE": "sync"}),
+    ("profile-gthread", ["--config", "gunicorn.conf.py"], {"GUNICORN_PROFILE": "gthread"}),
+    ("profile-gevent", ["--config", "gunicorn.conf.py"], {"GUNICORN_PROFILE": "gevent"})
+]
+
+def wait_until_ready(base_url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/health/db", timeout=1).read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def batch_smoke_check(base_url, timeout=5):
+    # El batch y un /health/db en paralelo tienen que responder; si el worker se cuelga no responde ninguno
+    request = urllib.request.Request(base_url + "/batch", data=json.dumps(BATCH_SMOKE).encode(),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        body = json.loads(urllib.request.urlopen(request, timeout=timeout).read())
+        urllib.request.urlopen(base_url + "/health/db", timeout=timeout).read()
+    except (OSError, ValueError) as e:
+        return "failed: %s" % e
+    if len(body.get("results", [])) != len(BATCH_SMOKE["requests"]):
+        return "failed: unexpected response"
+    return "ok"
+
+def run_scenario(name, extra_args, env, port, concurrency, duration):
+    base_url = "http://127.0.0.1:%d" % port
+    command = ["gunicorn", "wsgi", "--chdir", "./src/", "--bind", "127.0.0.1:%d" % port, "--access-logfile", "/dev/null"] + extra_args
+    process = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, PORT=str(port), **env),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(base_url):
+            return {"error": "server did not start (is the worker class installed?)"}
+        smoke = batch_smoke_check(base_url)
+        if smoke != "ok":
+            return {"error": "POST /batch smoke check " + smoke}
+        requests = [("GET", path, None) for path in PATHS]
+        return dict(run_load(base_url, requests, concurrency, duration), batch_smoke=smoke)
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=3100)
+    args = parser.parse_args()
+    results = {}
+    for name, extra_args, env in SCENARIOS:
+        results[name] = run_scenario(name, extra_args, env, args.port, args.concurrency, args.duration)
+        print(name, json.dumps(results[name]), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    if any("smoke check" in result.get("error", "") for result in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compara POST /favorites con un commit por request contra el group commit (FAVORITES_GROUP_COMMIT=1).
+
+Llena una base vacia con usuarios y personajes, levanta gunicorn (perfil gthread) en cada modo y
+manda favoritos nuevos con concurrencia fija; cada modo usa su propia mitad de los usuarios para
+que todos los POST sean inserts reales.
+
+    $ python benchmarks/group_commit.py --concurrency 32 --duration 10
+    $ DATABASE_URL=postgresql://... python benchmarks/group_commit.py --database-url $DATABASE_URL --max-wait-ms 2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from load import run_load
+from run import seed, start_server
+
+def favorite_requests(rng, first_user, users, characters, count):
+    pairs = set()
+    while len(pairs) < count:
+        pairs.add((first_user + rng.randrange(users), rng.randint(1, characters)))
+    return [('POST', '/favorites', {'user_id': user_id, 'character_id': character_id}) for user_id, character_id in pairs]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:////tmp/benchmark_group_commit.db')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--characters', type=int, default=1000)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--port', type=int, default=3300)
+    parser.add_argument('--random-seed', type=int, default=42)
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+
+    if not args.skip_seed:
+        if args.database_url.startswith('sqlite:///') and os.path.exists(args.database_url[len('sqlite:///'):]):
+            os.remove(args.database_url[len('sqlite:///'):])
+        seed(argparse.Namespace(users=args.users, characters=args.characters, planets=1, vehicles=1, favorites=0))
+
+    rng = random.Random(args.random_seed)
+    half = args.users // 2
+    modes = [
+        ('per_request_commit', {'FAVORITES_GROUP_COMMIT': '0'}, 1),
+        ('group_commit', {'FAVORITES_GROUP_COMMIT': '1', 'GROUP_COMMIT_MAX_BATCH': str(args.max_batch),
+                          'GROUP_COMMIT_MAX_WAIT_MS': str(args.max_wait_ms)}, half + 1)
+    ]
+    results = {}
+    for name, env, first_user in modes:
+        os.environ.update(env)
+        server = start_server(args)
+        try:
+            requests = favorite_requests(rng, first_user, half, args.characters, 200000)
+            results[name] = run_load('http://127.0.0.1:%d' % args.port, requests, args.concurrency, args.duration, partition=True)
+        finally:
+            server.terminate()
+            server.wait()
+        print(name, json.dumps(results[name]), file=sys.stderr)
+
+    baseline, grouped = results['per_request_commit'].get('rps'), results['group_commit'].get('rps')
+    if baseline and grouped:
+        results['speedup'] = round(grouped / baseline, 2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
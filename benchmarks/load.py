@@ -0,0 +1,111 @@
+"""
+Generador de carga HTTP sin dependencias externas: N threads con conexiones keep-alive
+que piden las rutas durante un tiempo fijo y reportan RPS y latencias en JSON.
+
+    $ python benchmarks/load.py http://localhost:3000 /characters /planets --concurrency 16 --duration 10
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+def summarize(latencies, errors, elapsed, statuses=None, exhausted=0):
+    # `non_2xx` junto a las latencias: un 404 o un 409 es rapido y no es el camino que se quiere medir
+    statuses = statuses or {}
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "non_2xx": sum(count for status, count in statuses.items() if not 200 <= status < 300),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None
+    }
+    if exhausted:
+        # Threads que terminaron su parte antes del final: hace falta una lista mas larga
+        summary["exhausted_threads"] = exhausted
+    return summary
+
+def run_load(base_url, requests, concurrency=8, duration=10.0, partition=False):
+    # `requests` es una lista de (metodo, path, body) que cada thread recorre en ronda.
+    # Con partition=True cada thread recibe su propia parte (requests[n::concurrency]) y la recorre
+    # una sola vez: para escrituras que solo tienen sentido una vez (crear o borrar un favorito)
+    url = urlsplit(base_url)
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = [0]
+    statuses = {}
+    exhausted = [0]
+    lock = threading.Lock()
+
+    def worker(offset):
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        local_latencies = []
+        local_errors = 0
+        local_statuses = {}
+        own = requests[offset::concurrency] if partition else requests
+        i = 0 if partition else offset
+        while time.monotonic() < deadline:
+            if partition and i == len(own):
+                with lock:
+                    exhausted[0] += 1
+                break
+            method, path, body = own[i % len(own)]
+            i += 1
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            payload = json.dumps(body) if body is not None else None
+            start = time.perf_counter()
+            for attempt in (1, 2):
+                try:
+                    connection.request(method, path, body=payload, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+                    if response.status >= 500:
+                        local_errors += 1
+                    local_latencies.append(time.perf_counter() - start)
+                    break
+                except (OSError, http.client.HTTPException):
+                    # El servidor puede cerrar una conexion keep-alive (sync workers, max_requests):
+                    # se reconecta y se reintenta una vez antes de contarlo como error
+                    connection.close()
+                    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+                    if attempt == 2:
+                        local_errors += 1
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.monotonic() - started, statuses, exhausted[0])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    requests = [("GET", path, None) for path in args.paths]
+    print(json.dumps(run_load(args.base_url, requests, args.concurrency, args.duration), indent=2))
+
+if __name__ == '__main__':
+    main()
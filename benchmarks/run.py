@@ -0,0 +1,257 @@
+"""
+Benchmark reproducible de todas las rutas de la API.
+
+Llena una base SQLite o Postgres (vacia) con volumenes configurables, levanta gunicorn contra ella,
+recorre cada ruta de src/app.py con concurrencia fija y escribe p50/p95/p99 y RPS en JSON.
+Con --compare se compara contra un resultado anterior (por ejemplo, del commit previo).
+
+    $ python benchmarks/run.py --characters 100000 --users 50000 --favorites 1000000 --output bench.json
+    $ python benchmarks/run.py --skip-seed --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from load import run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_BATCH_SIZE = 10000
+# Escrituras que solo se pueden hacer una vez: cada thread recorre su propia parte de la lista
+# (ver load.run_load), asi cada request crea o borra de verdad en vez de caer en el 404/"ya existe"
+ONE_SHOT_SCENARIOS = ('add_favorite', 'delete_fav_character', 'delete_fav_planet', 'delete_fav_vehicle')
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def insert_batches(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+def seeded_favorites_count(args, kind):
+    # Igual que el reparto de seed(): favoritos del tipo `kind` (0 personajes, 1 planetas, 2 vehiculos)
+    sizes = {0: args.characters, 1: args.planets, 2: args.vehicles}
+    count = args.favorites // 3 + (1 if kind < args.favorites % 3 else 0)
+    return min(count, args.users * sizes[kind])
+
+def seed(args):
+    # Se importa la app recien aqui para que tome DATABASE_URL de los argumentos
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    from flask_migrate import upgrade
+    from app import app
+    from models import db, User, Character, Planet, Vehicle, Favorite_character, Favorite_planet, Favorite_vehicle, parse_number, reconcile_favorite_counts
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        if db.session.query(Character.id).first() is not None:
+            sys.exit('The database is not empty: use --skip-seed or point --database-url to a fresh database')
+        started = time.perf_counter()
+        insert_batches(db, User.__table__, (
+            {'name': 'User %d' % i, 'email': 'user%d@example.com' % i, 'password': 'secret'}
+            for i in range(args.users)))
+        insert_batches(db, Character.__table__, (
+            dict(name='Character %d' % i, height=str(150 + i % 60), mass='unknown' if i % 7 == 0 else str(50 + i % 80),
+                 hair_color='brown', skin_color='fair', eye_color='blue', birth_year='19BBY', gender='male',
+                 height_num=parse_number(str(150 + i % 60)), mass_num=None if i % 7 == 0 else float(50 + i % 80))
+            for i in range(args.characters)))
+        insert_batches(db, Planet.__table__, (
+            dict(name='Planet %d' % i, rotation_period='24', orbital_period='365', diameter=str(5000 + i % 10000),
+                 climate='temperate', gravity='1 standard', terrain='grasslands', surface_water='40',
+                 population=str(1000 * (i + 1)), diameter_num=float(5000 + i % 10000), population_num=float(1000 * (i + 1)))
+            for i in range(args.planets)))
+        insert_batches(db, Vehicle.__table__, (
+            dict(name='Vehicle %d' % i, model='Model %d' % (i % 50), cost_in_credits=str(10000 + i),
+                 length='10', max_atmosphering_speed='800', passangers='4', cargo_capacity=str(100 * (i % 100)),
+                 vehicle_class='speeder', manufacturer='Manufacturer %d' % (i % 20),
+                 cost_in_credits_num=float(10000 + i), cargo_capacity_num=float(100 * (i % 100)))
+            for i in range(args.vehicles)))
+
+        # Favoritos repartidos entre los tres tipos; para un mismo usuario los ids nunca se repiten
+        sizes = {0: args.characters, 1: args.planets, 2: args.vehicles}
+        columns = {0: 'character_id', 1: 'planet_id', 2: 'vehicle_id'}
+        tables = {0: Favorite_character.__table__, 1: Favorite_planet.__table__, 2: Favorite_vehicle.__table__}
+        for kind in range(3):
+            count = seeded_favorites_count(args, kind)
+            insert_batches(db, tables[kind], (
+                {'user_id': index % args.users + 1,
+                 columns[kind]: (index % args.users + index // args.users) % sizes[kind] + 1}
+                for index in range(count)))
+        # Los INSERT directos no pasan por los contadores de favoritos: se recalculan de una vez
+        reconcile_favorite_counts()
+        db.session.commit()
+        return round(time.perf_counter() - started, 2)
+
+def build_scenarios(args):
+    rng = random.Random(args.random_seed)
+
+    def ids(n, count=1000):
+        return [rng.randint(1, n) for _ in range(count)]
+
+    def gets(template, n):
+        return [('GET', template % i, None) for i in ids(n)]
+
+    # Cuantas escrituras de una sola vez hacen falta para toda la duracion del escenario
+    write_pool = int(args.max_write_rps * args.duration)
+
+    # (usuario, entidad) distintos que existen en el seed, para que cada DELETE borre algo
+    def existing_favorites(kind, n):
+        count = min(seeded_favorites_count(args, kind), write_pool)
+        return [(index % args.users + 1, (index % args.users + index // args.users) % n + 1) for index in range(count)]
+
+    # (usuario, personaje) distintos que no estan en el seed: el seed le da a cada usuario los
+    # personajes siguientes a su id, asi que se sigue desde el primer desplazamiento sin usar
+    def new_favorites(n):
+        first = -(-seeded_favorites_count(args, 0) // args.users)
+        pairs = ((user % args.users + 1, (user % args.users + shift) % n + 1)
+                 for shift in range(first, n) for user in range(args.users))
+        return [pair for pair, _ in zip(pairs, range(write_pool))]
+
+    return {
+        'list_users': [('GET', '/users', None)],
+        'list_characters': [('GET', '/characters', None)],
+        'list_characters_sorted': [('GET', '/characters?sort=-mass&fields=name,mass', None)],
+        'list_planets_filtered': [('GET', '/planets?filter=population>1000000', None)],
+        'list_vehicles': [('GET', '/vehicles', None)],
+        'detail_user': gets('/users/%d', args.users),
+        'detail_character': gets('/characters/%d', args.characters),
+        'detail_planet': gets('/planets/%d', args.planets),
+        'detail_vehicle': gets('/vehicles/%d', args.vehicles),
+        'multi_get_characters': [('GET', '/characters?ids=' + ','.join(map(str, ids(args.characters, 20))), None)
+                                 for _ in range(200)],
+        'top_characters': [('GET', '/characters/top', None)],
+        'favorites': gets('/favorites/%d', args.users),
+        'favorites_expand': [('GET', '/favorites/%d?expand=1' % i, None) for i in ids(args.users)],
+        'batch_favorites_page': [('POST', '/batch', {'requests': [
+            {'path': '/users/%d' % u}, {'path': '/favorites/%d' % u},
+            {'path': '/characters?ids=' + ','.join(map(str, ids(args.characters, 5)))},
+            {'path': '/planets?ids=' + ','.join(map(str, ids(args.planets, 5)))}]})
+            for u in ids(args.users, 200)],
+        'search': [('GET', '/search?q=%s' % quote(term), None) for term in ('character 12', 'planet', 'model 7', 'manufacturer')],
+        'add_favorite': [('POST', '/favorites', {'user_id': u, 'character_id': c})
+                         for u, c in new_favorites(args.characters)],
+        'delete_fav_character': [('DELETE', '/favorite/character/%d/%d' % pair, None)
+                                 for pair in existing_favorites(0, args.characters)],
+        'delete_fav_planet': [('DELETE', '/favorite/planet/%d/%d' % pair, None)
+                              for pair in existing_favorites(1, args.planets)],
+        'delete_fav_vehicle': [('DELETE', '/favorite/vehicle/%d/%d' % pair, None)
+                               for pair in existing_favorites(2, args.vehicles)]
+    }
+
+def start_server(args):
+    env = dict(os.environ, DATABASE_URL=args.database_url, PORT=str(args.port))
+    command = ['gunicorn', 'wsgi', '--chdir', './src/', '--config', 'gunicorn.conf.py',
+               '--bind', '127.0.0.1:%d' % args.port, '--access-logfile', '/dev/null']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen('http://127.0.0.1:%d/health/db' % args.port, timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit('gunicorn did not start')
+
+def compare(results, baseline, threshold):
+    # Regresion: el p95 sube o el RPS baja mas que `threshold` (fraccion)
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('rps') or not current.get('rps'):
+            continue
+        rps_change = current['rps'] / previous['rps'] - 1
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1 if previous.get('p95_ms') else 0
+        line = '%-24s rps %+6.1f%%  p95 %+6.1f%%' % (name, rps_change * 100, p95_change * 100)
+        if rps_change < -threshold or p95_change > threshold:
+            regressions.append(name)
+            line += '  REGRESSION'
+        print(line, file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:////tmp/benchmark.db')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--characters', type=int, default=100000)
+    parser.add_argument('--planets', type=int, default=10000)
+    parser.add_argument('--vehicles', type=int, default=10000)
+    parser.add_argument('--favorites', type=int, default=1000000)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    parser.add_argument('--only', nargs='*', help='run only these scenarios')
+    parser.add_argument('--port', type=int, default=3200)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='previous JSON report to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    parser.add_argument('--max-write-rps', type=float, default=5000,
+                        help='size of the create/delete favorite lists, in requests per second of --duration')
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+
+    seed_seconds = None
+    if not args.skip_seed:
+        if args.database_url.startswith('sqlite:///') and os.path.exists(args.database_url[len('sqlite:///'):]):
+            os.remove(args.database_url[len('sqlite:///'):])
+        seed_seconds = seed(args)
+        print('seeded in %ss' % seed_seconds, file=sys.stderr)
+
+    # Los escenarios de escritura van al final para que no cambien los datos que leen los demas
+    scenarios = build_scenarios(args)
+    names = [name for name in scenarios if not args.only or name in args.only]
+    server = start_server(args)
+    results = {}
+    try:
+        for name in names:
+            results[name] = run_load('http://127.0.0.1:%d' % args.port, scenarios[name], args.concurrency, args.duration,
+                                     partition=name in ONE_SHOT_SCENARIOS)
+            print(name, json.dumps(results[name]), file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': args.database_url.split(':', 1)[0],
+            'volumes': {'users': args.users, 'characters': args.characters, 'planets': args.planets,
+                        'vehicles': args.vehicles, 'favorites': args.favorites},
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'gunicorn_profile': os.getenv('GUNICORN_PROFILE', 'gthread'),
+            'seed_seconds': seed_seconds
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark de la serializacion de los listados: objetos del ORM + serialize() + json
+contra tuplas Row + dict(zip(...)) + orjson, sobre N personajes sinteticos en SQLite en memoria.
+
+    $ python benchmarks/serialization.py --rows 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from models import db, Character
+from json_provider import OrjsonProvider, orjson
+from utils import select_columns, serialize_row
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+def seed(rows):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Character.__table__.insert(), [{
+        'name': 'Character %d' % i, 'height': str(150 + i % 60), 'mass': str(50 + i % 80),
+        'hair_color': 'brown', 'skin_color': 'fair', 'eye_color': 'blue',
+        'birth_year': '19BBY', 'gender': 'male'
+    } for i in range(rows)])
+    db.session.commit()
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        size = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": round(best, 4), "bytes": size}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+    app = make_app()
+    stdlib = DefaultJSONProvider(app)
+    fast = OrjsonProvider(app) if orjson is not None else stdlib
+    results = {}
+    with app.app_context():
+        for rows in args.rows:
+            seed(rows)
+
+            def orm_stdlib():
+                items = Character.query.order_by(Character.id).all()
+                return len(stdlib.dumps({"results": [item.serialize() for item in items]}, separators=(',', ':')))
+
+            def rows_stdlib():
+                query, fields = select_columns(Character.query, Character)
+                return len(stdlib.dumps({"results": [serialize_row(row, fields) for row in query.order_by(Character.id)]}, separators=(',', ':')))
+
+            def rows_orjson():
+                query, fields = select_columns(Character.query, Character)
+                return len(fast.dumps({"results": [serialize_row(row, fields) for row in query.order_by(Character.id)]}))
+
+            results[rows] = {
+                "orm+serialize+json": timed(orm_stdlib),
+                "rows+json": timed(rows_stdlib),
+                "rows+orjson" if orjson is not None else "rows+json (orjson not installed)": timed(rows_orjson)
+            }
+            print(rows, json.dumps(results[rows]), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Tiempo de arranque en frio: desde que arranca el proceso hasta la primera respuesta de la API.
+
+Cada medicion es un proceso nuevo de Python que importa la app con create_app(...) y responde
+GET /health/db con el test client. Se reporta la mediana de import, primera respuesta y total
+(incluido el arranque del interprete) para cada modo del admin. Con --max-ms falla si el modo
+`lazy` (el de produccion) tarda mas, para usarlo como guardia contra regresiones.
+
+    $ python benchmarks/startup.py --runs 10
+    $ python benchmarks/startup.py --max-ms 400 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (nombre, argumentos de create_app)
+MODES = [
+    ('full', "admin='eager', migrate=True"),
+    ('lazy', "admin='lazy', migrate=False"),
+    ('off', "admin='off', migrate=False")
+]
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+app = create_app(%s)
+imported = time.perf_counter()
+response = app.test_client().get('/health/db')
+answered = time.perf_counter()
+print(json.dumps({"status": response.status_code, "import_ms": (imported - started) * 1000,
+                  "first_response_ms": (answered - imported) * 1000}))
+"""
+
+def measure(factory_args, env):
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', CHILD % factory_args], cwd=os.path.join(ROOT, 'src'), env=env)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result['total_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL', 'sqlite:////tmp/benchmark.db'))
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--max-ms', type=float, help='fail if the median total of the lazy mode is above this')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+
+    results = {}
+    for name, factory_args in MODES:
+        runs = [measure(factory_args, env) for _ in range(args.runs)]
+        if any(run['status'] != 200 for run in runs):
+            sys.exit('%s: /health/db did not answer 200, is the database reachable?' % name)
+        results[name] = {key: round(statistics.median(run[key] for run in runs), 1)
+                         for key in ('import_ms', 'first_response_ms', 'total_ms')}
+        print(name, json.dumps(results[name]), file=sys.stderr)
+
+    output = json.dumps({'runs': args.runs, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    if args.max_ms is not None and results['lazy']['total_ms'] > args.max_ms:
+        sys.exit('lazy startup took %.1fms, budget is %.1fms' % (results['lazy']['total_ms'], args.max_ms))
+
+if __name__ == '__main__':
+    main()
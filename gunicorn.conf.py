@@ -0,0 +1,79 @@
+# Configuracion de gunicorn, se elige el perfil con la variable GUNICORN_PROFILE:
+#   sync     un worker por proceso, el comportamiento de siempre
+#   gthread  (por defecto) cada proceso atiende varios requests con threads
+#   gevent   workers con greenlets, requiere `pip install gevent psycogreen`
+# Read more: https://docs.gunicorn.org/en/stable/settings.html
+import glob
+import multiprocessing
+import os
+import tempfile
+
+profile = os.getenv("GUNICORN_PROFILE", "gthread")
+
+bind = "0.0.0.0:" + os.getenv("PORT", "3000")
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+wsgi_app = "wsgi"
+
+# Un query lento ya no bloquea toda la instancia: hay varios procesos y cada uno atiende en paralelo.
+# Sin WEB_CONCURRENCY son 2 * CPUs + 1, limitados por la memoria del plan: cada worker (app, admin
+# y caches) ocupa unos 60MB de RSS y el master otro tanto, asi que con 512MB entran 5 workers
+memory_limit_mb = int(os.getenv("MEMORY_LIMIT_MB", 512))
+worker_memory_mb = int(os.getenv("WORKER_MEMORY_MB", 80))
+max_workers_for_memory = max(1, memory_limit_mb // worker_memory_mb - 1)
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, max_workers_for_memory)))
+if profile == "gthread":
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+elif profile == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+else:
+    worker_class = "sync"
+
+# La app se importa una vez en el master y los workers la heredan con fork
+preload_app = True
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+# Reinicia cada worker despues de N requests, con jitter para que no se reinicien todos a la vez
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+accesslog = "-"
+
+# Cada worker escribe sus metricas en esta carpeta y /metrics las suma (ver src/metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "api-metrics"))
+
+
+def on_starting(server):
+    # Los archivos de una ejecucion anterior no deben sumarse a los de esta
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "metrics_*.json")):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    if profile == "gevent":
+        # psycopg2 bloquea el loop de gevent si no se parchea para que ceda en cada espera de IO
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    # Las conexiones abiertas en el master no se pueden compartir entre procesos
+    from wsgi import application
+    from models import db
+    with application.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Ultima escritura del worker antes de salir (por ejemplo al llegar a max_requests),
+    # para que child_exit encuentre todos sus contadores
+    from metrics import registry
+    from models import db
+    from wsgi import application
+    with application.app_context():
+        registry.flush(db.engine, force=True)
+
+
+def child_exit(server, worker):
+    # El master junta los contadores del worker que termino en metrics_aggregate.json y borra su archivo
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.environ["METRICS_DIR"])
@@ -77,6 +77,14 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the full-text search tables (SQLite FTS5 and its shadow tables) are
+    # managed by hand in their migration, keep autogenerate away from them;
+    # sqlite_sequence is SQLite's own table for the AUTOINCREMENT counters
+    def include_name(name, type_, parent_names):
+        if type_ == 'table':
+            return not name.startswith('search_index') and name != 'sqlite_sequence'
+        return True
+
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
@@ -84,6 +92,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_name=include_name,
             **current_app.extensions['migrate'].configure_args
         )
 
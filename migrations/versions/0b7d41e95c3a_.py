@@ -0,0 +1,80 @@
+"""empty message
+
+Revision ID: 0b7d41e95c3a
+Revises: f3b9c0d4a7e2
+Create Date: 2026-10-18 13:02:44.560218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7d41e95c3a'
+down_revision = 'f3b9c0d4a7e2'
+branch_labels = None
+depends_on = None
+
+# tabla -> (codigo del tipo, columnas con el texto buscable); igual que models.SEARCH_DOCUMENTS
+SEARCH_DOCUMENTS = {
+    'character': (1, ['name']),
+    'planet': (2, ['name']),
+    'vehicle': (3, ['name', 'model', 'manufacturer'])
+}
+
+
+def document(columns, prefix=''):
+    return " || ' ' || ".join(prefix + column for column in columns)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Indices GIN sobre el mismo to_tsvector que usa la consulta de /search
+        for table, (code, columns) in SEARCH_DOCUMENTS.items():
+            op.execute(
+                "CREATE INDEX ix_{table}_search ON {table} USING GIN (to_tsvector('simple', {document}))"
+                .format(table=table, document=document(columns))
+            )
+    elif dialect == 'sqlite':
+        # Tabla FTS5 con un documento por entidad, mantenida con triggers.
+        # rowid = id * 4 + codigo del tipo, asi los triggers actualizan por rowid sin recorrer la tabla
+        op.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "kind UNINDEXED, entity_id UNINDEXED, name UNINDEXED, document, tokenize = 'unicode61')"
+        )
+        for table, (code, columns) in SEARCH_DOCUMENTS.items():
+            values = dict(table=table, code=code)
+            op.execute(
+                "INSERT INTO search_index (rowid, kind, entity_id, name, document) "
+                "SELECT id * 4 + {code}, '{table}', id, name, {document} FROM {table}"
+                .format(document=document(columns), **values)
+            )
+            op.execute(
+                "CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+                "INSERT INTO search_index (rowid, kind, entity_id, name, document) "
+                "VALUES (NEW.id * 4 + {code}, '{table}', NEW.id, NEW.name, {document}); "
+                "END".format(document=document(columns, 'NEW.'), **values)
+            )
+            op.execute(
+                "CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} BEGIN "
+                "UPDATE search_index SET name = NEW.name, document = {document} WHERE rowid = OLD.id * 4 + {code}; "
+                "END".format(document=document(columns, 'NEW.'), **values)
+            )
+            op.execute(
+                "CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+                "DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code}; "
+                "END".format(**values)
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCH_DOCUMENTS:
+            op.execute("DROP INDEX IF EXISTS ix_{table}_search".format(table=table))
+    elif dialect == 'sqlite':
+        for table in SEARCH_DOCUMENTS:
+            for action in ('insert', 'update', 'delete'):
+                op.execute("DROP TRIGGER IF EXISTS {table}_search_{action}".format(table=table, action=action))
+        op.execute("DROP TABLE IF EXISTS search_index")
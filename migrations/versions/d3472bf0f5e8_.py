@@ -0,0 +1,51 @@
+"""empty message
+
+Revision ID: d3472bf0f5e8
+Revises: 103d43806c04
+Create Date: 2026-10-18 10:56:04.798828
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3472bf0f5e8'
+down_revision = '103d43806c04'
+branch_labels = None
+depends_on = None
+
+
+# tabla -> (codigo del tipo, columnas con el texto buscable); igual que en 0b7d41e95c3a
+SEARCH_DOCUMENTS = {
+    'character': (1, ['name']),
+    'planet': (2, ['name']),
+    'vehicle': (3, ['name', 'model', 'manufacturer'])
+}
+
+
+def document(columns, prefix=''):
+    return " || ' ' || ".join(prefix + column for column in columns)
+
+
+def create_update_triggers(narrow):
+    # Con narrow=True el trigger solo corre si el UPDATE toca alguna columna del documento;
+    # asi los cambios de favorite_count y demas columnas no reescriben el indice FTS
+    for table, (code, columns) in SEARCH_DOCUMENTS.items():
+        op.execute("DROP TRIGGER IF EXISTS {table}_search_update".format(table=table))
+        op.execute(
+            "CREATE TRIGGER {table}_search_update AFTER UPDATE {of}ON {table} BEGIN "
+            "UPDATE search_index SET name = NEW.name, document = {document} WHERE rowid = OLD.id * 4 + {code}; "
+            "END".format(table=table, code=code, document=document(columns, 'NEW.'),
+                         of='OF ' + ', '.join(columns) + ' ' if narrow else '')
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        create_update_triggers(narrow=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        create_update_triggers(narrow=False)
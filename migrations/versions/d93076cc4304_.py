@@ -0,0 +1,41 @@
+"""empty message
+
+Revision ID: d93076cc4304
+Revises: 277a401d0134
+Create Date: 2026-10-18 11:11:05.184483
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93076cc4304'
+down_revision = '277a401d0134'
+branch_labels = None
+depends_on = None
+
+
+FAVORITE_TABLES = ('favorite_character', 'favorite_planet', 'favorite_vehicle')
+
+
+def upgrade():
+    # favorites_version ya no hace falta: los ids de favoritos no se reusan y el watermark
+    # (count, max(id)) alcanza. En SQLite eso requiere AUTOINCREMENT, que obliga a recrear la tabla
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('favorites_version')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in FAVORITE_TABLES:
+            with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+                pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in FAVORITE_TABLES:
+            with op.batch_alter_table(table, recreate='always'):
+                pass
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('favorites_version', sa.Integer(), server_default='0', nullable=False))
@@ -1,7 +1,53 @@
 import os
 from flask_admin import Admin
-from models import db, User, Character, Vehicle, Planet, Favorite_character, Favorite_vehicle, Favorite_planet
+from models import db, FAVORITE_KINDS, increment_favorite_counts, User, Character, Vehicle, Planet, Favorite_character, Favorite_vehicle, Favorite_planet
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import inspect
+from cache import entity_cache, entity_key
+from utils import INTERNAL_COLUMNS
+
+class CachedModelView(ModelView):
+    # Saca de la cache los registros editados o borrados desde el admin
+    def __init__(self, model, session, **kwargs):
+        # Las columnas `*_num` se calculan solas a partir del texto y favorite_count lo mantienen
+        # los favoritos, no se editan a mano
+        self.form_excluded_columns = list(getattr(model, 'numeric_columns', {}).values()) + list(INTERNAL_COLUMNS)
+        super().__init__(model, session, **kwargs)
+
+    def after_model_change(self, form, model, is_created):
+        entity_cache.invalidate(entity_key(type(model), model.id))
+
+    def after_model_delete(self, model):
+        entity_cache.invalidate(entity_key(type(model), model.id))
+
+class FavoriteModelView(ModelView):
+    # Los favoritos creados, editados o borrados desde el admin mantienen favorite_count;
+    # on_model_change/on_model_delete corren antes del commit, en la misma transaccion
+    def entity(self):
+        # (modelo de la entidad, columna FK, relacion que llena el formulario)
+        for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS:
+            if fav_model is self.model:
+                column = entity_column.property.columns[0]
+                relation = next(rel.key for rel in inspect(fav_model).relationships
+                                if any(local is column for local in rel.local_columns))
+                return entity_model, entity_column.key, relation
+
+    def on_model_change(self, form, model, is_created):
+        # El formulario cambia la relacion; la FK conserva el valor anterior hasta el flush
+        entity_model, field, relation = self.entity()
+        old_id = None if is_created else getattr(model, field)
+        new_entity = getattr(model, relation)
+        new_id = new_entity.id if new_entity is not None else getattr(model, field)
+        if old_id == new_id:
+            return
+        if old_id is not None:
+            increment_favorite_counts(entity_model, [old_id], -1)
+        if new_id is not None:
+            increment_favorite_counts(entity_model, [new_id])
+
+    def on_model_delete(self, model):
+        entity_model, field, relation = self.entity()
+        increment_favorite_counts(entity_model, [getattr(model, field)], -1)
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -10,12 +56,12 @@ def setup_admin(app):
     
     # Add your models here, for example this is how we add a the User model to the admin
     admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Character, db.session))
-    admin.add_view(ModelView(Vehicle, db.session))
-    admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(Favorite_character, db.session))
-    admin.add_view(ModelView(Favorite_vehicle, db.session))
-    admin.add_view(ModelView(Favorite_planet, db.session))
+    admin.add_view(CachedModelView(Character, db.session))
+    admin.add_view(CachedModelView(Vehicle, db.session))
+    admin.add_view(CachedModelView(Planet, db.session))
+    admin.add_view(FavoriteModelView(Favorite_character, db.session))
+    admin.add_view(FavoriteModelView(Favorite_vehicle, db.session))
+    admin.add_view(FavoriteModelView(Favorite_planet, db.session))
 
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
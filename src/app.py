@@ -2,63 +2,116 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+import threading
+from flask import Blueprint, Flask, request, jsonify, current_app
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Character, Planet, Vehicle, Favorite_character, Favorite_planet, Favorite_vehicle
+from sqlalchemy import text
+from utils import APIException, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, generate_sitemap, get_page_args, paginate, wants_stream, stream_ndjson, get_fields_arg, select_columns, serialize_row, pick_fields, make_etag, not_modified, with_etag, get_bulk_favorites_args, get_filter_arg, get_sort_arg, get_ids_arg, fetch_by_ids, get_top_limit_arg, get_int_arg
+from cache import get_cached_entity
+from config import configure_database, get_pool_stats
+from json_provider import setup_json
+from compression import setup_compression
+from instrumentation import setup_instrumentation
+from metrics import setup_metrics
+from lazy_admin import mount_admin
+from commands import setup_commands
+from export import export_response
+from group_commit import save_favorite
+from batch import setup_batch
+from models import db, User, Character, Planet, Vehicle, Favorite_character, Favorite_planet, Favorite_vehicle, get_table_versions, get_favorites_watermark, get_user_favorites, get_existing_entities, get_existing_favorites, bulk_insert_favorites, bulk_delete_favorites, delete_favorite, user_and_entity_exist, search_catalog, delete_user_favorites, get_top_entities
 #from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
+# Todas las rutas de la API; create_app las registra en cada app que arma
+api = Blueprint('api', __name__)
 
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def create_app(admin=None, migrate=True):
+    # admin: 'lazy' (Flask-Admin se monta con el primer request a /admin), 'eager' u 'off';
+    # por defecto sale de ADMIN_MODE. migrate=False deja afuera Flask-Migrate (y alembic),
+    # que solo hacen falta para `flask db ...`
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    setup_json(app)
 
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+    configure_database(app)
+
+    if migrate:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    db.init_app(app)
+    CORS(app)
+    setup_compression(app)
+    setup_instrumentation(app)
+    setup_metrics(app, db)
+    app.register_blueprint(api)
+    mount_admin(app, admin or os.getenv('ADMIN_MODE', 'lazy'))
+    setup_commands(app)
+    setup_batch(app)
+    return app
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # `from app import app` (flask CLI, scripts) arma la app completa recien cuando se pide
+    global _default_app
+    if name != 'app':
+        raise AttributeError(name)
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
+
+# Estado de la conexion a la db y del pool de conexiones de este worker
+@api.route('/health/db')
+def health_db():
+    try:
+        db.session.execute(text('SELECT 1'))
+        return jsonify({"status": "ok", "pool": get_pool_stats(db.engine)}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e), "pool": get_pool_stats(db.engine)}), 503
 
 # ---------------------------------------------------------ENDPOINTS-------------------------------------------
 
 #--------------------------------------------users----------------------------------
 # Obtiene informacion de todos los usuarios
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
 def get_users():
+    limit, after = get_page_args()
     try:
-        users_results = User.query.all()
+        # Si el cliente ya tiene esta version de la tabla se responde 304 sin consultar
+        etag = make_etag(get_table_versions('user'))
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        # Solo las columnas publicas como tuplas, sin hidratar objetos del ORM
+        query, fields = select_columns(User.query, User)
+        users_results, next_cursor = paginate(query, User, limit, after)
         # print(users_results)
-        results = list(map(lambda item: item.serialize(), users_results))
+        results = [serialize_row(row, fields) for row in users_results]
         # print(results)
-        if results:
+        if results or after is not None:
             response_body = {
                 "msg": "ok",
-                "results": results
+                "results": results,
+                "next": next_cursor
             }
-            return jsonify(response_body), 200
+            return with_etag(jsonify(response_body), etag), 200
         return jsonify({'error': 'Users not found'}), 404
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
 #Obtiene informacion de un solo usuario segun su id
-@app.route('/users/<int:id>')
+@api.route('/users/<int:id>')
 def get_user(id):
     # print(id)
     try:
@@ -75,13 +128,14 @@ def get_user(id):
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
 #Elimina un usuario por id
-@app.route('/users/<int:id>', methods = ['DELETE'])
+@api.route('/users/<int:id>', methods = ['DELETE'])
 def delete_user(id):
     try:
         user = User.query.get(id)
         if not user:
             return jsonify({'error':'User not found'}), 404
-        #Eliminando el usuario de la db
+        #Eliminando el usuario de la db, junto con sus favoritos (y sus contadores)
+        delete_user_favorites(id)
         db.session.delete(user)
         db.session.commit()
         return jsonify({'message': 'User deleted successfully'}), 200
@@ -91,35 +145,76 @@ def delete_user(id):
 
 #------------------------------------Personajes---------------------------------
 #Obtiene todos los personajes
-@app.route('/characters', methods=['GET'])
+@api.route('/characters', methods=['GET'])
 def get_characters():
+    fields = get_fields_arg(Character)
+    filters = get_filter_arg(Character)
+    sort = get_sort_arg(Character)
+    ids = get_ids_arg()
+    if ids is not None:
+        # Multi-get: `?ids=1,5,9` responde en ese orden e informa los ids que no existen
+        # (`missing`) y, con `?filter=`, los que existen pero no lo cumplen (`filtered`)
+        try:
+            etag = make_etag(get_table_versions('character'))
+            cached_response = not_modified(etag)
+            if cached_response:
+                return cached_response
+            results, missing, filtered = fetch_by_ids(Character.query, Character, ids, fields, filters)
+            response_body = {"msg": "ok", "results": results, "missing": missing}
+            if filters:
+                response_body["filtered"] = filtered
+            return with_etag(jsonify(response_body), etag), 200
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+    if wants_stream():
+        query, fields = select_columns(Character.query.filter(*filters), Character, fields, sort)
+        return stream_ndjson(query, Character, fields, sort)
+    limit, after = get_page_args(sort)
     try:
-        characters_results = Character.query.all()
+        # Si el cliente ya tiene esta version de la tabla se responde 304 sin consultar
+        etag = make_etag(get_table_versions('character'))
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        query, fields = select_columns(Character.query.filter(*filters), Character, fields, sort)
+        characters_results, next_cursor = paginate(query, Character, limit, after, sort)
         # print(characters_results)
-        results = list(map(lambda item: item.serialize(), characters_results))
+        results = [serialize_row(row, fields) for row in characters_results]
         # print(results)
-        if results:
+        if results or after is not None:
             response_body = {
                 "msg": "ok",
-                "results": results
+                "results": results,
+                "next": next_cursor
             }
-            return jsonify(response_body), 200
+            return with_etag(jsonify(response_body), etag), 200
         return jsonify({'error': 'Characters not found'}), 404
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+#Ranking de los personajes con mas usuarios que los tienen en favoritos
+@api.route('/characters/top', methods=['GET'])
+def get_top_characters():
+    limit = get_top_limit_arg()
+    try:
+        results = [{"id": row.id, "name": row.name, "favorites": row.favorite_count} for row in get_top_entities(Character, limit)]
+        return jsonify({"msg": "ok", "results": results}), 200
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
 #Obtiene informacion de un solo personaje segun su id
-@app.route('/characters/<int:character_id>', methods=['GET'])
+@api.route('/characters/<int:character_id>', methods=['GET'])
 def get_character(character_id):
     # print(character_id)
+    fields = get_fields_arg(Character)
     try:
-        query_character = Character.query.filter_by(id = character_id).first()
-        # print(query_character.serialize())
+        # El detalle completo sale de la cache, `fields` solo recorta la respuesta
+        query_character = get_cached_entity(Character, character_id)
         if query_character is None:
             return jsonify({'error': 'Character not found'}), 404
         response_body = {
             "msg": "ok",
-            "result": query_character.serialize()
+            "result": pick_fields(query_character, fields)
         }
         return jsonify(response_body), 200
     except Exception as e:
@@ -127,35 +222,76 @@ def get_character(character_id):
     
 #------------------------------------Planetas----------------------------------
 #Obtiene todos los planetas
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
 def get_planets():
+    fields = get_fields_arg(Planet)
+    filters = get_filter_arg(Planet)
+    sort = get_sort_arg(Planet)
+    ids = get_ids_arg()
+    if ids is not None:
+        # Multi-get: `?ids=1,5,9` responde en ese orden e informa los ids que no existen
+        # (`missing`) y, con `?filter=`, los que existen pero no lo cumplen (`filtered`)
+        try:
+            etag = make_etag(get_table_versions('planet'))
+            cached_response = not_modified(etag)
+            if cached_response:
+                return cached_response
+            results, missing, filtered = fetch_by_ids(Planet.query, Planet, ids, fields, filters)
+            response_body = {"msg": "ok", "results": results, "missing": missing}
+            if filters:
+                response_body["filtered"] = filtered
+            return with_etag(jsonify(response_body), etag), 200
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+    if wants_stream():
+        query, fields = select_columns(Planet.query.filter(*filters), Planet, fields, sort)
+        return stream_ndjson(query, Planet, fields, sort)
+    limit, after = get_page_args(sort)
     try:
-        planets_results = Planet.query.all()
+        # Si el cliente ya tiene esta version de la tabla se responde 304 sin consultar
+        etag = make_etag(get_table_versions('planet'))
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        query, fields = select_columns(Planet.query.filter(*filters), Planet, fields, sort)
+        planets_results, next_cursor = paginate(query, Planet, limit, after, sort)
         # print(planets_results)
-        results = list(map(lambda item: item.serialize(), planets_results))
+        results = [serialize_row(row, fields) for row in planets_results]
         # print(results)
-        if results:
+        if results or after is not None:
             response_body = {
                 "msg": "ok",
-                "results": results
+                "results": results,
+                "next": next_cursor
             }
-            return jsonify(response_body), 200
+            return with_etag(jsonify(response_body), etag), 200
         return jsonify({'error': 'Planets not found'}), 404
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+#Ranking de los planetas con mas usuarios que los tienen en favoritos
+@api.route('/planets/top', methods=['GET'])
+def get_top_planets():
+    limit = get_top_limit_arg()
+    try:
+        results = [{"id": row.id, "name": row.name, "favorites": row.favorite_count} for row in get_top_entities(Planet, limit)]
+        return jsonify({"msg": "ok", "results": results}), 200
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
 #Obtiene informacion de un solo planeta
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+@api.route('/planets/<int:planet_id>', methods=['GET'])
 def get_planet(planet_id):
     # print(planet_id)
+    fields = get_fields_arg(Planet)
     try:
-        query_planet = Planet.query.filter_by(id = planet_id).first()
-        # print(query_planet.serialize())
+        # El detalle completo sale de la cache, `fields` solo recorta la respuesta
+        query_planet = get_cached_entity(Planet, planet_id)
         if query_planet is None:
             return jsonify({'error': 'Planet not found'}), 404
         response_body = {
             "msg": "ok",
-            "result": query_planet.serialize()
+            "result": pick_fields(query_planet, fields)
         }
         return jsonify(response_body), 200
     except Exception as e:
@@ -163,57 +299,131 @@ def get_planet(planet_id):
     
 #------------------------------------Vehiculos---------------------------------
 #Obtiene todos los planetas
-@app.route('/vehicles', methods=['GET'])
+@api.route('/vehicles', methods=['GET'])
 def get_vehicles():
+    fields = get_fields_arg(Vehicle)
+    filters = get_filter_arg(Vehicle)
+    sort = get_sort_arg(Vehicle)
+    ids = get_ids_arg()
+    if ids is not None:
+        # Multi-get: `?ids=1,5,9` responde en ese orden e informa los ids que no existen
+        # (`missing`) y, con `?filter=`, los que existen pero no lo cumplen (`filtered`)
+        try:
+            etag = make_etag(get_table_versions('vehicle'))
+            cached_response = not_modified(etag)
+            if cached_response:
+                return cached_response
+            results, missing, filtered = fetch_by_ids(Vehicle.query, Vehicle, ids, fields, filters)
+            response_body = {"msg": "ok", "results": results, "missing": missing}
+            if filters:
+                response_body["filtered"] = filtered
+            return with_etag(jsonify(response_body), etag), 200
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+    if wants_stream():
+        query, fields = select_columns(Vehicle.query.filter(*filters), Vehicle, fields, sort)
+        return stream_ndjson(query, Vehicle, fields, sort)
+    limit, after = get_page_args(sort)
     try:
-        vehicles_results = Vehicle.query.all()
+        # Si el cliente ya tiene esta version de la tabla se responde 304 sin consultar
+        etag = make_etag(get_table_versions('vehicle'))
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        query, fields = select_columns(Vehicle.query.filter(*filters), Vehicle, fields, sort)
+        vehicles_results, next_cursor = paginate(query, Vehicle, limit, after, sort)
         # print(vehicles_results)
-        results = list(map(lambda item: item.serialize(), vehicles_results))
+        results = [serialize_row(row, fields) for row in vehicles_results]
         # print(results)
-        if results:
+        if results or after is not None:
             response_body = {
                 "msg": "ok",
-                "results": results
+                "results": results,
+                "next": next_cursor
             }
-            return jsonify(response_body), 200
+            return with_etag(jsonify(response_body), etag), 200
         return jsonify({'error': 'Vehicles not found'}), 404
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
     
+#Ranking de los vehiculos con mas usuarios que los tienen en favoritos
+@api.route('/vehicles/top', methods=['GET'])
+def get_top_vehicles():
+    limit = get_top_limit_arg()
+    try:
+        results = [{"id": row.id, "name": row.name, "favorites": row.favorite_count} for row in get_top_entities(Vehicle, limit)]
+        return jsonify({"msg": "ok", "results": results}), 200
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
 #Obtiene informacion de un solo vehiculo
-@app.route('/vehicles/<int:vehicle_id>', methods=['GET'])
+@api.route('/vehicles/<int:vehicle_id>', methods=['GET'])
 def get_vehicle(vehicle_id):
     # print(vehicle_id)
+    fields = get_fields_arg(Vehicle)
     try:
-        query_vehicle = Vehicle.query.filter_by(id = vehicle_id).first()
-        # print(query_vehicle.serialize())
+        # El detalle completo sale de la cache, `fields` solo recorta la respuesta
+        query_vehicle = get_cached_entity(Vehicle, vehicle_id)
         if query_vehicle is None:
             return jsonify({'error': 'Vehicle not found'}), 404
         response_body = {
             "msg": "ok",
-            "result": query_vehicle.serialize()
+            "result": pick_fields(query_vehicle, fields)
         }
         return jsonify(response_body), 200
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
     
+#------------------------------------Busqueda----------------------------------
+#Busca personajes, planetas y vehiculos por nombre (y modelo/fabricante en vehiculos)
+@api.route('/search', methods=['GET'])
+def search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        raise APIException('Please enter a search term with ?q=', status_code=400)
+    limit = min(get_int_arg('limit', DEFAULT_SEARCH_LIMIT, 1, 'limit must be a positive integer'), MAX_SEARCH_LIMIT)
+    try:
+        results = [{"type": row.kind, "id": row.id, "name": row.name} for row in search_catalog(q, limit)]
+        return jsonify({"msg": "ok", "results": results}), 200
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+#------------------------------------Exportes----------------------------------
+#Exporta usuarios o favoritos completos (o desde un id) en CSV o NDJSON, solo con el token de admin
+@api.route('/export/<table>', methods=['GET'])
+def export_table(table):
+    return export_response(table)
+
 #--------------------------------------------------------Favoritos---------------------------------
 #Obtiene todos los favoritos de un usuario segun su id
-@app.route('/favorites/<int:id_user>')
+@api.route('/favorites/<int:id_user>')
 def get_fav(id_user):
     try:
-        user = User.query.get(id_user)
-        if not user:
+        expand = request.args.get('expand') in ('1', 'true')
+        # Con expand la respuesta incluye los nombres: un cambio en el catalogo tambien cambia el ETag
+        versions = get_table_versions('user', 'character', 'planet', 'vehicle') if expand else get_table_versions('user')
+        etag = make_etag(versions, get_favorites_watermark(id_user))
+        cached_response = not_modified(etag)
+        if cached_response:
+            return cached_response
+        # Usuario y favoritos (con el nombre de cada entidad) salen de una sola consulta
+        rows = get_user_favorites(id_user)
+        if rows is None:
             return jsonify({"error": "User not found. Please enter a valid user ID to view their favorites."}), 404
-        
-        fav_characters = Favorite_character.query.filter_by(user_id = id_user).all()
-        fav_planets = Favorite_planet.query.filter_by(user_id = id_user).all()
-        fav_vehicles = Favorite_vehicle.query.filter_by(user_id = id_user).all()
-        # print(fav_characters)
-        favorites_characters = list(map(lambda item: item.serialize(), fav_characters))
-        favorites_planets = list(map(lambda item: item.serialize(), fav_planets))
-        favorites_vehicles = list(map(lambda item: item.serialize(), fav_vehicles))
-        # print(favorites_characters)
+
+        favorites = {'character': [], 'planet': [], 'vehicle': []}
+        for row in rows:
+            favorite = {
+                "id": row.favorite_id,
+                "user_id": row.user_id,
+                row.kind + "_id": row.entity_id
+            }
+            if expand:
+                favorite[row.kind] = {"id": row.entity_id, "name": row.name}
+            favorites[row.kind].append(favorite)
+        favorites_characters = favorites['character']
+        favorites_planets = favorites['planet']
+        favorites_vehicles = favorites['vehicle']
 
         if not favorites_characters and not favorites_planets and not favorites_vehicles:
             return jsonify({'message': 'Favorites not found'}), 404
@@ -223,12 +433,12 @@ def get_fav(id_user):
             "favorites_planets": favorites_planets,
             "favorites_vehicles": favorites_vehicles
         }
-        return jsonify(response_body), 200
+        return with_etag(jsonify(response_body), etag), 200
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
 #Agregar personajes, planetas y vechiculos favoritos
-@app.route('/favorites', methods=['POST'])
+@api.route('/favorites', methods=['POST'])
 def add_favorite():
     try:
         # Obteniendo y guardando el id del body ingresado
@@ -241,26 +451,17 @@ def add_favorite():
             return jsonify({"message":"Please enter a user ID"}), 400
         
         if character_id_new:
-            #Creando y guardando un nuevo favorito
-            new_fav = Favorite_character(user_id = user_id_new, character_id = character_id_new)
-            db.session.add(new_fav)
-            db.session.commit()
-            response_body = new_fav.serialize()
-            return jsonify(response_body), 201
+            #Creando y guardando un nuevo favorito, si ya existia se devuelve el mismo
+            response_body, created = save_favorite(Favorite_character, 'character_id', user_id_new, character_id_new)
+            return jsonify(response_body), 201 if created else 200
         
         elif planet_id_new:
-            new_fav = Favorite_planet(user_id = user_id_new, planet_id = planet_id_new)
-            db.session.add(new_fav)
-            db.session.commit()
-            response_body = new_fav.serialize()
-            return jsonify(response_body), 201
+            response_body, created = save_favorite(Favorite_planet, 'planet_id', user_id_new, planet_id_new)
+            return jsonify(response_body), 201 if created else 200
         
         elif vehicle_id_new:
-            new_fav = Favorite_vehicle(user_id=user_id_new, vehicle_id=vehicle_id_new)
-            db.session.add(new_fav)
-            db.session.commit()
-            response_body = new_fav.serialize()
-            return jsonify(response_body), 201
+            response_body, created = save_favorite(Favorite_vehicle, 'vehicle_id', user_id_new, vehicle_id_new)
+            return jsonify(response_body), 201 if created else 200
         else:
             # mandaste un user id, pero no me mandaste que favoritear
             return jsonify({"message":"You entered the user ID, but you haven't indicated which ID you want to mark as a favorite."}), 400
@@ -268,22 +469,85 @@ def add_favorite():
     except Exception as e:
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+def group_ids_by_kind(favorites):
+    ids_by_kind = {}
+    for kind, entity_id in favorites:
+        if kind is not None:
+            ids_by_kind.setdefault(kind, []).append(entity_id)
+    return ids_by_kind
+
+def bulk_result(kind, entity_id, status):
+    if kind is None:
+        return {"favorite": entity_id, "status": status}
+    return {kind + "_id": entity_id, "status": status}
+
+#Agrega muchos favoritos de un usuario en un solo request y una sola transaccion
+@api.route('/favorites/bulk', methods=['POST'])
+def add_favorites_bulk():
+    user_id, favorites = get_bulk_favorites_args()
+    try:
+        if not User.query.get(user_id):
+            return jsonify({"error": "User not found"}), 404
+        ids_by_kind = group_ids_by_kind(favorites)
+        existing_entities = get_existing_entities(ids_by_kind)
+        existing_favorites = get_existing_favorites(user_id, ids_by_kind)
+
+        results = []
+        new_ids_by_kind = {}
+        for kind, entity_id in favorites:
+            if kind is None:
+                results.append(bulk_result(kind, entity_id, "invalid"))
+            elif (kind, entity_id) not in existing_entities:
+                results.append(bulk_result(kind, entity_id, "not_found"))
+            elif (kind, entity_id) in existing_favorites or entity_id in new_ids_by_kind.get(kind, []):
+                results.append(bulk_result(kind, entity_id, "exists"))
+            else:
+                new_ids_by_kind.setdefault(kind, []).append(entity_id)
+                results.append(bulk_result(kind, entity_id, "created"))
+
+        bulk_insert_favorites(user_id, new_ids_by_kind)
+        db.session.commit()
+        return jsonify({"user_id": user_id, "results": results}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+#Elimina muchos favoritos de un usuario en un solo request y una sola transaccion
+@api.route('/favorites/bulk', methods=['DELETE'])
+def delete_favorites_bulk():
+    user_id, favorites = get_bulk_favorites_args()
+    try:
+        if not User.query.get(user_id):
+            return jsonify({"error": "User not found"}), 404
+        ids_by_kind = group_ids_by_kind(favorites)
+        existing_favorites = get_existing_favorites(user_id, ids_by_kind)
+
+        results = []
+        for kind, entity_id in favorites:
+            if kind is None:
+                results.append(bulk_result(kind, entity_id, "invalid"))
+            elif (kind, entity_id) in existing_favorites:
+                results.append(bulk_result(kind, entity_id, "deleted"))
+            else:
+                results.append(bulk_result(kind, entity_id, "not_found"))
+
+        bulk_delete_favorites(user_id, ids_by_kind)
+        db.session.commit()
+        return jsonify({"user_id": user_id, "results": results}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
 #Elimina un personaje favorito de cada usuario segun su id
-@app.route('/favorite/character/<int:id_user>/<int:id_character>', methods = ['DELETE'])
+@api.route('/favorite/character/<int:id_user>/<int:id_character>', methods = ['DELETE'])
 def delete_fav_character(id_user, id_character):
     try:
-        #Verificando que los id ingresados existan para proceder con la busqueda del favorito
-        user = User.query.get(id_user)
-        character = Character.query.get(id_character)
-        if not user or not character:
-            return jsonify({"error": "The user or character does not exist. Please enter valid ID values."}), 404
-        
-        favorite_character = Favorite_character.query.filter_by(user_id = id_user, character_id = id_character).first()
-        if not favorite_character:
+        #Se intenta borrar directamente, solo si no se borro nada se verifica que los id existan
+        if not delete_favorite(Favorite_character, 'character_id', id_user, id_character):
+            if not user_and_entity_exist(id_user, Character, id_character):
+                return jsonify({"error": "The user or character does not exist. Please enter valid ID values."}), 404
             return jsonify({'error': 'Character not found in their favorites'}), 404
-        
-        #Eliminando el favorito de la db
-        db.session.delete(favorite_character)
+
         db.session.commit()
         return jsonify({'message': 'Favorite character deleted successfully'}), 200
 
@@ -291,19 +555,14 @@ def delete_fav_character(id_user, id_character):
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
     
 #Elimina un planeta favorito de cada usuario segun su id
-@app.route('/favorite/planet/<int:id_user>/<int:id_planet>', methods = ['DELETE'])
+@api.route('/favorite/planet/<int:id_user>/<int:id_planet>', methods = ['DELETE'])
 def delete_fav_planet(id_user, id_planet):
     try:
-        user = User.query.get(id_user)
-        planet = Planet.query.get(id_planet)
-        if not user or not planet:
-            return jsonify({"error": "The user or planet does not exist. Please enter valid ID values."}), 404
-        
-        favorite_planet = Favorite_planet.query.filter_by(user_id = id_user, planet_id = id_planet).first()
-        if not favorite_planet:
+        if not delete_favorite(Favorite_planet, 'planet_id', id_user, id_planet):
+            if not user_and_entity_exist(id_user, Planet, id_planet):
+                return jsonify({"error": "The user or planet does not exist. Please enter valid ID values."}), 404
             return jsonify({'error':'Planet not found in their favorites'}), 404
         
-        db.session.delete(favorite_planet)
         db.session.commit()
         return jsonify({'message': 'Favorite planet deleted successfully'}), 200
 
@@ -311,19 +570,14 @@ def delete_fav_planet(id_user, id_planet):
         return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
 #Elimina un vehiculo favorito de cada usuario segun su id
-@app.route('/favorite/vehicle/<int:id_user>/<int:id_vehicle>', methods = ['DELETE'])
+@api.route('/favorite/vehicle/<int:id_user>/<int:id_vehicle>', methods = ['DELETE'])
 def delete_fav_vehicle(id_user, id_vehicle):
     try:
-        user = User.query.get(id_user)
-        vehicle = Vehicle.query.get(id_vehicle)
-        if not user or not vehicle:
-            return jsonify({"error": "The user or vehicle does not exist. Please enter valid ID values."}), 404
-
-        favorite_vehicle = Favorite_vehicle.query.filter_by(user_id = id_user, vehicle_id = id_vehicle).first()
-        if not favorite_vehicle:
+        if not delete_favorite(Favorite_vehicle, 'vehicle_id', id_user, id_vehicle):
+            if not user_and_entity_exist(id_user, Vehicle, id_vehicle):
+                return jsonify({"error": "The user or vehicle does not exist. Please enter valid ID values."}), 404
             return jsonify({'error':'Vehicle not found in their favorites'}), 404
         
-        db.session.delete(favorite_vehicle)
         db.session.commit()
         return jsonify({'message': 'Favorite vehicle deleted successfully'}), 200
 
@@ -333,4 +587,4 @@ def delete_fav_vehicle(id_user, id_vehicle):
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import jsonify, request
+from werkzeug.test import EnvironBuilder
+from utils import APIException
+
+# Metodos que no escriben: se pueden ejecutar en paralelo
+READ_ONLY_METHODS = ('GET', 'HEAD')
+# Headers del request /batch que se copian a cada sub-request
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language')
+
+def get_batch_args(max_requests):
+    # Body: {"requests": [{"method": "GET", "path": "/users/1"}, {"method": "POST", "path": "/favorites", "body": {...}}]}
+    body = request.get_json(silent=True) or {}
+    items = body.get('requests')
+    if not isinstance(items, list) or not items:
+        raise APIException('Please enter a list of requests', status_code=400)
+    if len(items) > max_requests:
+        raise APIException('At most %d requests per batch' % max_requests, status_code=400)
+    sub_requests = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) or not item['path'].startswith('/'):
+            raise APIException('Each request needs a path starting with /', status_code=400)
+        method = str(item.get('method', 'GET')).upper()
+        path = item['path']
+        if path.split('?')[0].rstrip('/') == '/batch':
+            raise APIException('Batches cannot be nested', status_code=400)
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise APIException('headers must be an object', status_code=400)
+        sub_requests.append({'method': method, 'path': path, 'body': item.get('body'), 'headers': headers})
+    return sub_requests
+
+def get_stages(sub_requests):
+    # Las lecturas seguidas forman una etapa que corre en paralelo; cada escritura es su propia
+    # etapa, asi una lectura posterior siempre ve lo que escribieron las anteriores
+    stages = []
+    for index, sub_request in enumerate(sub_requests):
+        read_only = sub_request['method'] in READ_ONLY_METHODS
+        if read_only and stages and stages[-1][0]:
+            stages[-1][1].append(index)
+        else:
+            stages.append((read_only, [index]))
+    return stages
+
+def gevent_patched():
+    # Con el perfil gevent de gunicorn threading esta parcheado: un ThreadPoolExecutor bloquea el loop
+    # de gevent (y con el todo el worker), asi que las lecturas van a un pool de greenlets
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+def timeout_result():
+    return {"status": 504, "body": {"error": "Batch time limit exceeded"}}
+
+def setup_batch(app):
+    app.config.setdefault('BATCH_MAX_REQUESTS', int(os.getenv("BATCH_MAX_REQUESTS", 20)))
+    app.config.setdefault('BATCH_MAX_WORKERS', int(os.getenv("BATCH_MAX_WORKERS", 4)))
+    app.config.setdefault('BATCH_TIMEOUT', float(os.getenv("BATCH_TIMEOUT", 10)))
+    # Un pool de threads por proceso, creado con el primer batch (despues del fork de gunicorn);
+    # no conviene que tenga mas threads que conexiones el pool de la db
+    executor = []
+    executor_lock = threading.Lock()
+
+    def get_executor():
+        with executor_lock:
+            if not executor:
+                executor.append(ThreadPoolExecutor(max_workers=app.config['BATCH_MAX_WORKERS'], thread_name_prefix='batch'))
+        return executor[0]
+
+    def run_parallel(calls, timeout):
+        # Ejecuta `calls` (lista de (indice, funcion, argumentos)) en paralelo; devuelve
+        # {indice: resultado} con las que terminaron a tiempo. Las que siguen corriendo
+        # no se pueden interrumpir, solo se deja de esperarlas
+        if gevent_patched():
+            from gevent.pool import Pool
+            pool = Pool(app.config['BATCH_MAX_WORKERS'])
+            greenlets = {pool.spawn(function, *args): index for index, function, args in calls}
+            pool.join(timeout=timeout)
+            return {index: greenlet.value for greenlet, index in greenlets.items() if greenlet.ready()}
+        futures = {get_executor().submit(function, *args): index for index, function, args in calls}
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            future.cancel()
+        return {futures[future]: future.result() for future in done}
+
+    def dispatch(sub_request, forwarded):
+        # Cada sub-request pasa por la ruta real con su propio app context (su propio `g`, sesion de db,
+        # Server-Timing y metricas), igual que si hubiera llegado por HTTP
+        headers = dict(forwarded, **sub_request['headers'])
+        builder = EnvironBuilder(path=sub_request['path'], method=sub_request['method'], headers=headers, json=sub_request['body'])
+        try:
+            with app.app_context(), app.request_context(builder.get_environ()):
+                response = app.full_dispatch_request()
+                body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+                result = {"status": response.status_code, "body": body}
+                if 'ETag' in response.headers:
+                    result["etag"] = response.headers['ETag']
+                return result
+        except Exception as e:
+            return {"status": 500, "body": {"error": "Internal server error", "message": str(e)}}
+
+    @app.route('/batch', methods=['POST'])
+    def batch():
+        sub_requests = get_batch_args(app.config['BATCH_MAX_REQUESTS'])
+        forwarded = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        deadline = time.monotonic() + app.config['BATCH_TIMEOUT']
+        results = [None] * len(sub_requests)
+        for read_only, indexes in get_stages(sub_requests):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if read_only and len(indexes) > 1:
+                finished = run_parallel([(index, dispatch, (sub_requests[index], forwarded)) for index in indexes], remaining)
+                for index, result in finished.items():
+                    results[index] = result
+                if len(finished) < len(indexes):
+                    break
+            else:
+                for index in indexes:
+                    results[index] = dispatch(sub_requests[index], forwarded)
+        return jsonify({"results": [result or timeout_result() for result in results]}), 200
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from models import get_table_versions
+
+class LRUCache:
+    # Cache en memoria del proceso: expulsa la entrada menos usada al llenarse
+    # y descarta las que pasaron su TTL
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+class TableVersions:
+    # Version de cada tabla (ver models.Table_version), leida de la db a lo sumo una vez cada
+    # `interval` segundos por proceso: asi un cambio hecho en otro worker invalida la cache
+    # de este con un retraso maximo de `interval`, sin una consulta extra por cada hit
+    def __init__(self, interval=1):
+        self.interval = interval
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._versions.get(name)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        version = get_table_versions(name)[0]
+        with self._lock:
+            self._versions[name] = (version, now + self.interval)
+        return version
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+
+# Personajes, planetas y vehiculos serializados, con llave (modelo, id); cada entrada guarda
+# la version de la tabla con la que se leyo
+entity_cache = LRUCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 1024)),
+    ttl=float(os.getenv("CACHE_TTL", 300))
+)
+table_versions = TableVersions(interval=float(os.getenv("CACHE_VERSION_CHECK_INTERVAL", 1)))
+
+def entity_key(model, id):
+    return (model.__name__, id)
+
+def get_cached_entity(model, id):
+    # Read-through: si no esta en cache, o se guardo con otra version de la tabla,
+    # se busca en la db y se guarda serializado. La version se lee antes que la fila:
+    # si alguien escribe entre medio, la entrada queda vieja y se descarta en la proxima
+    key = entity_key(model, id)
+    version = table_versions.get(model.__tablename__)
+    entry = entity_cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    item = model.query.filter_by(id = id).first()
+    if item is None:
+        return None
+    result = item.serialize()
+    entity_cache.set(key, (version, result))
+    return result
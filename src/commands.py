@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+import os
+import time
+import click
+from flask import current_app
+from sqlalchemy import bindparam
+from export import EXPORT_FORMATS, EXPORT_TABLES, export_lines
+from models import db, Character, Planet, Vehicle, bump_table_versions, parse_number, reconcile_favorite_counts
+from utils import public_fields
+
+try:
+    import ijson
+except ImportError:  # ijson esta en el Pipfile; sin el solo se aceptan .json chicos, leidos completos en memoria
+    ijson = None
+
+# Recurso de SWAPI -> (modelo, nombres de SWAPI que difieren de la columna)
+CATALOG_RESOURCES = {
+    'characters': (Character, {}),
+    'people': (Character, {}),
+    'planets': (Planet, {}),
+    'vehicles': (Vehicle, {'passengers': 'passangers'})
+}
+IMPORT_BATCH_SIZE = 5000
+# Sin ijson un .json se carga entero: por encima de este tamaño se corta en vez de llenar la memoria
+JSON_IN_MEMORY_MAX_BYTES = 50 * 1024 * 1024
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+def read_records(path, file_format):
+    # Generador: lee el archivo fila por fila (NDJSON, CSV, o JSON con ijson) sin cargarlo entero
+    with open(path, 'rb' if file_format == 'json' else 'r', **({} if file_format == 'json' else {'encoding': 'utf-8'})) as f:
+        if file_format == 'ndjson':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == 'csv':
+            yield from csv.DictReader(f)
+        elif ijson is not None:
+            # Una lista de objetos, o una pagina de la API de SWAPI ({"results": [...]})
+            first = f.read(1)
+            while first and first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            yield from ijson.items(f, 'item' if first == b'[' else 'results.item')
+        else:
+            data = json.load(f)
+            yield from (data['results'] if isinstance(data, dict) else data)
+
+def normalize(record, model, renames):
+    # Acepta tambien el formato de fixtures de SWAPI: {"model": "resources.people", "fields": {...}}
+    if isinstance(record.get('fields'), dict):
+        record = record['fields']
+    record = {renames.get(key, key): value for key, value in record.items()}
+    row = {}
+    for column in public_fields(model):
+        if column == 'id':
+            continue
+        value = record.get(column)
+        row[column] = 'unknown' if value in (None, '') else str(value)
+    for column, numeric_column in model.numeric_columns.items():
+        row[numeric_column] = parse_number(row[column])
+    return row
+
+def copy_rows(table, rows):
+    # COPY de Postgres: mucho mas rapido que INSERT para lotes grandes
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (table.name, ', '.join('"%s"' % c for c in columns)),
+        buffer
+    )
+
+def upsert_batch(model, rows):
+    # Upsert por la llave natural (name): un SELECT ... IN para saber cuales existen,
+    # un UPDATE executemany para esos y un INSERT masivo (COPY en Postgres) para el resto.
+    # Es best-effort porque name no es unico: dentro del lote gana la ultima fila con cada nombre,
+    # y si en la tabla ya hay varias filas con el mismo nombre se actualiza la de menor id.
+    # Devuelve (insertadas, actualizadas, repetidas en el lote, nombres con varias filas en la tabla)
+    table = model.__table__
+    by_name = {row['name']: row for row in rows}
+    existing = {}
+    ambiguous = set()
+    for name, id in db.session.query(model.name, model.id).filter(model.name.in_(list(by_name))).order_by(model.id):
+        if name in existing:
+            ambiguous.add(name)
+        existing.setdefault(name, id)
+    updates = [dict({'b_' + key: value for key, value in row.items()}, b_id=existing[name])
+               for name, row in by_name.items() if name in existing]
+    inserts = [row for name, row in by_name.items() if name not in existing]
+    if updates:
+        columns = [column for column in rows[0] if column != 'name']
+        statement = table.update().where(table.c.id == bindparam('b_id')).values({column: bindparam('b_' + column) for column in columns})
+        db.session.execute(statement, updates)
+    if inserts:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            copy_rows(table, inserts)
+        else:
+            db.session.execute(table.insert(), inserts)
+    return len(inserts), len(updates), len(rows) - len(by_name), len(ambiguous)
+
+def setup_commands(app):
+
+    @app.cli.command('import-catalog')
+    @click.argument('resource', type=click.Choice(sorted(CATALOG_RESOURCES)))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(['json', 'ndjson', 'csv']), help='Defaults to the file extension.')
+    @click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+    def import_catalog(resource, path, file_format, batch_size):
+        """Import a SWAPI dump (JSON, NDJSON or CSV) into characters, planets or vehicles."""
+        model, renames = CATALOG_RESOURCES[resource]
+        file_format = file_format or detect_format(path)
+        if file_format == 'json' and ijson is None and os.path.getsize(path) > JSON_IN_MEMORY_MAX_BYTES:
+            raise click.ClickException('%s is too large to load into memory: install ijson (pipenv install) '
+                                       'or convert it to NDJSON' % path)
+        started = time.perf_counter()
+        total = 0
+        counts = [0, 0, 0, 0]
+        batch = []
+        for record in read_records(path, file_format):
+            batch.append(normalize(record, model, renames))
+            if len(batch) >= batch_size:
+                counts = [a + b for a, b in zip(counts, upsert_batch(model, batch))]
+                db.session.commit()
+                total += len(batch)
+                batch = []
+                click.echo('%d rows (%.0f rows/s)' % (total, total / (time.perf_counter() - started)))
+        if batch:
+            counts = [a + b for a, b in zip(counts, upsert_batch(model, batch))]
+            total += len(batch)
+        inserted, updated, collapsed, ambiguous = counts
+        # Los INSERT/UPDATE directos no pasan por el flush del ORM, la version de la tabla se sube a mano
+        bump_table_versions(db.session.connection(), [model.__tablename__])
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        click.echo('Imported %d rows into %s: %d inserted, %d updated in %.2fs (%.0f rows/s)' % (
+            total, model.__tablename__, inserted, updated, elapsed, total / elapsed if elapsed else 0))
+        if collapsed:
+            click.echo('%d rows repeated a name already seen in their batch, only the last one was kept' % collapsed)
+        if ambiguous:
+            click.echo('%d names matched several existing rows, the one with the lowest id was updated' % ambiguous)
+
+    @app.cli.command('export')
+    @click.argument('table', type=click.Choice(list(EXPORT_TABLES)))
+    @click.option('--format', 'file_format', type=click.Choice(EXPORT_FORMATS), default='ndjson', show_default=True)
+    @click.option('--since', default=0, show_default=True, help='Export only rows with an id greater than this one.')
+    @click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+    def export(table, file_format, since, output):
+        """Stream users or favorites as CSV or NDJSON, with constant memory."""
+        for chunk in export_lines(table, file_format, since, current_app.json.dumps):
+            output.write(chunk)
+
+    @app.cli.command('reconcile-favorite-counts')
+    def reconcile_favorite_counts_command():
+        """Recompute the favorite counters of characters, planets and vehicles."""
+        started = time.perf_counter()
+        fixed = reconcile_favorite_counts()
+        db.session.commit()
+        for kind, count in fixed.items():
+            click.echo('%s: %d counters fixed' % (kind, count))
+        click.echo('Done in %.2fs' % (time.perf_counter() - started))
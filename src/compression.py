@@ -0,0 +1,64 @@
+import gzip
+import os
+from flask import request
+from cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional, sin el solo se ofrece gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/plain')
+
+# Bytes ya comprimidos de las respuestas con ETag, con llave (etag, encoding)
+compressed_cache = LRUCache(
+    max_entries=int(os.getenv("COMPRESS_CACHE_ENTRIES", 256)),
+    ttl=float(os.getenv("CACHE_TTL", 300))
+)
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BR_LEVEL'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+def setup_compression(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv("COMPRESS_MIN_SIZE", 1024)))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.getenv("COMPRESS_LEVEL", 6)))
+    app.config.setdefault('COMPRESS_BR_LEVEL', int(os.getenv("COMPRESS_BR_LEVEL", 5)))
+
+    @app.after_request
+    def compress_response(response):
+        if response.status_code == 304:
+            # Un 304 lleva los mismos ETag y Vary que tendria el 200 (RFC 9110 15.4.5)
+            response.vary.add('Accept-Encoding')
+            return response
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        compressed = compressed_cache.get((etag, encoding)) if etag else None
+        if compressed is None:
+            compressed = compress(response.get_data(), encoding, app.config)
+            if etag:
+                compressed_cache.set((etag, encoding), compressed)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # Cada codificacion es una representacion distinta, con su propio ETag
+            response.set_etag(etag + '-' + encoding, weak)
+        return response
@@ -0,0 +1,48 @@
+import os
+
+def env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_database_url():
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        return db_url.replace("postgres://", "postgresql://")
+    return "sqlite:////tmp/test.db"
+
+def get_engine_options(db_url):
+    # Opciones del pool leidas del entorno, asi cada worker de gunicorn puede dimensionar su pool
+    options = {
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True)
+    }
+    if db_url.startswith("sqlite"):
+        # SQLite no usa QueuePool, las opciones de tamaño no aplican
+        return options
+    options.update({
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800))
+    })
+    statement_timeout = os.getenv("DB_STATEMENT_TIMEOUT")
+    if statement_timeout and db_url.startswith("postgresql"):
+        # En milisegundos, Postgres cancela las consultas que tardan mas que esto
+        options["connect_args"] = {"options": "-c statement_timeout=%d" % int(statement_timeout)}
+    return options
+
+def configure_database(app):
+    db_url = get_database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(db_url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+def get_pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    return stats
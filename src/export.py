@@ -0,0 +1,77 @@
+import csv
+import hmac
+import io
+import os
+from flask import current_app, request, Response, stream_with_context
+from models import db, User, Favorite_character, Favorite_planet, Favorite_vehicle
+from utils import APIException, NDJSON_MIMETYPE, STREAM_BATCH_SIZE, get_int_arg
+
+# Tablas exportables -> (modelo, columnas); el password de los usuarios nunca se exporta
+EXPORT_TABLES = {
+    'users': (User, ('id', 'name', 'email')),
+    'favorite_characters': (Favorite_character, ('id', 'user_id', 'character_id')),
+    'favorite_planets': (Favorite_planet, ('id', 'user_id', 'planet_id')),
+    'favorite_vehicles': (Favorite_vehicle, ('id', 'user_id', 'vehicle_id'))
+}
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': NDJSON_MIMETYPE}
+
+def export_rows(table, since=0):
+    # Cursor del lado del servidor (stream_results): la db entrega las filas de a STREAM_BATCH_SIZE
+    # y la memoria no crece con el tamaño de la tabla. `since` permite exportes incrementales por id
+    model, columns = EXPORT_TABLES[table]
+    query = (db.session.query(*[getattr(model, column) for column in columns])
+             .filter(model.id > since)
+             .order_by(model.id)
+             .execution_options(stream_results=True)
+             .yield_per(STREAM_BATCH_SIZE))
+    for row in query:
+        yield row
+
+def export_lines(table, file_format, since=0, dumps=None):
+    # Genera el exporte ya formateado, un bloque de texto por cada lote de filas
+    columns = EXPORT_TABLES[table][1]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if file_format == 'csv':
+        writer.writerow(columns)
+    count = 0
+    for row in export_rows(table, since):
+        if file_format == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(dumps(dict(zip(columns, row))) + '\n')
+        count += 1
+        if count % STREAM_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def require_admin_token():
+    # Sin ADMIN_TOKEN configurado el exporte por HTTP queda deshabilitado
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        raise APIException('Export is disabled, set ADMIN_TOKEN to enable it', status_code=403)
+    header = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(header.encode(), ('Bearer ' + token).encode()):
+        raise APIException('Invalid admin token', status_code=401)
+
+def get_export_args(table):
+    if table not in EXPORT_TABLES:
+        raise APIException('Unknown table, expected one of: ' + ', '.join(EXPORT_TABLES), status_code=404)
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in EXPORT_FORMATS:
+        raise APIException('format must be csv or ndjson', status_code=400)
+    since = get_int_arg('since', 0, 0, 'since must be a non-negative integer')
+    return file_format, since
+
+def export_response(table):
+    require_admin_token()
+    file_format, since = get_export_args(table)
+    lines = export_lines(table, file_format, since, current_app.json.dumps)
+    response = Response(stream_with_context(lines), mimetype=EXPORT_MIMETYPES[file_format])
+    response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (table, file_format)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
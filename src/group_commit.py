@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from models import db, insert_favorite, insert_favorites_batch
+
+# Con FAVORITES_GROUP_COMMIT=1 los POST /favorites concurrentes de un mismo worker se juntan
+# durante unos milisegundos y se guardan con un solo INSERT multi-fila y un solo commit.
+# Solo sirve con workers que atienden varios requests a la vez (gthread o gevent)
+GROUP_COMMIT_ENABLED = os.getenv("FAVORITES_GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 64))
+GROUP_COMMIT_MAX_WAIT = float(os.getenv("GROUP_COMMIT_MAX_WAIT_MS", 5)) / 1000
+
+class _Slot:
+    def __init__(self, item):
+        self.item = item
+        self.leader = False
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+
+class GroupCommitter:
+    # El primer request que llega a una cola vacia es el lider: espera hasta `max_wait` (o hasta
+    # juntar `max_batch`), ejecuta el lote en su propia sesion y reparte los resultados. Si quedan
+    # pendientes, el primero de ellos pasa a ser el lider del lote siguiente
+    def __init__(self, execute, max_batch=64, max_wait=0.005):
+        self.execute = execute
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)
+        self._pending = []
+        self._leader_active = False
+
+    def submit(self, item):
+        slot = _Slot(item)
+        with self._lock:
+            self._pending.append(slot)
+            if not self._leader_active:
+                self._leader_active = True
+                slot.leader = True
+            elif len(self._pending) >= self.max_batch:
+                self._full.notify()
+        if not slot.leader:
+            slot.done.wait()
+        if slot.leader:
+            self._lead()
+        if slot.error is not None:
+            raise slot.error
+        return slot.value
+
+    def _lead(self):
+        with self._lock:
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._full.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if self._pending:
+                successor = self._pending[0]
+                successor.leader = True
+                successor.done.set()
+            else:
+                self._leader_active = False
+        try:
+            results = self.execute([slot.item for slot in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for slot, result in zip(batch, results):
+            if isinstance(result, Exception):
+                slot.error = result
+            else:
+                slot.value = result
+            slot.done.set()
+
+def run_favorite_batch(items):
+    # Todo el lote en una transaccion; si falla (por ejemplo un id que no existe en Postgres)
+    # se reintenta uno por uno para que cada request reciba su propio resultado o error
+    try:
+        results = insert_favorites_batch(items)
+        db.session.commit()
+        return results
+    except Exception:
+        db.session.rollback()
+    results = []
+    for item in items:
+        try:
+            results.append(insert_favorite(*item))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            results.append(e)
+    return results
+
+favorite_committer = GroupCommitter(run_favorite_batch, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_WAIT)
+
+def save_favorite(fav_model, entity_field, user_id, entity_id):
+    # insert_favorite + commit, o encolado en el group commit si esta activado
+    if GROUP_COMMIT_ENABLED:
+        return favorite_committer.submit((fav_model, entity_field, user_id, entity_id))
+    result = insert_favorite(fav_model, entity_field, user_id, entity_id)
+    db.session.commit()
+    return result
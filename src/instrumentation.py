@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+import sys
+import time
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('api.requests')
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    # Solo se cuentan las consultas hechas dentro de un request (no migraciones ni comandos)
+    if has_request_context() and has_app_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+
+def get_query_budget(app, endpoint):
+    budgets = app.config['SQL_QUERY_BUDGETS']
+    return budgets.get(endpoint, app.config['SQL_QUERY_BUDGET'])
+
+def setup_request_log(enabled):
+    # Una linea JSON por request en stderr (la recoge gunicorn/el contenedor). El logger propio no
+    # hereda el nivel WARNING del root: sin handler ni nivel INFO los logger.info se pierden
+    if not enabled:
+        logger.setLevel(logging.WARNING)
+        return
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.propagate = False
+
+def setup_instrumentation(app):
+    # Presupuesto de consultas por request (guardia contra N+1): global y/o por endpoint.
+    # Con SQL_QUERY_BUDGET_STRICT (o app.testing) pasarse del presupuesto lanza QueryBudgetExceeded
+    budget = os.getenv("SQL_QUERY_BUDGET")
+    app.config.setdefault('SQL_QUERY_BUDGET', int(budget) if budget else None)
+    app.config.setdefault('SQL_QUERY_BUDGETS', {})
+    app.config.setdefault('SQL_QUERY_BUDGET_STRICT', os.getenv("SQL_QUERY_BUDGET_STRICT", "0") == "1")
+    # REQUEST_LOG=0 apaga el log por request (los avisos de presupuesto se siguen emitiendo)
+    app.config.setdefault('REQUEST_LOG', os.getenv("REQUEST_LOG", "1") == "1")
+    setup_request_log(app.config['REQUEST_LOG'])
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def add_server_timing(response):
+        if 'request_start' not in g:
+            return response
+        total_ms = (time.perf_counter() - g.request_start) * 1000
+        db_ms = g.sql_time * 1000
+        response.headers.add(
+            'Server-Timing',
+            'db;dur=%.2f;desc="%d queries", app;dur=%.2f' % (db_ms, g.sql_count, total_ms - db_ms)
+        )
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 2),
+            "db_ms": round(db_ms, 2),
+            "queries": g.sql_count
+        }))
+
+        budget = get_query_budget(app, request.endpoint)
+        if budget is not None and g.sql_count > budget:
+            message = '%s ran %d queries, budget is %d' % (request.endpoint, g.sql_count, budget)
+            if app.config['SQL_QUERY_BUDGET_STRICT'] or app.testing:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
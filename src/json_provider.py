@@ -0,0 +1,34 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, sin el se usa el json de la libreria estandar
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Serializa con orjson (varias veces mas rapido que json), los tipos que orjson no conoce
+    # pasan por el mismo `default` del provider de Flask (Decimal, UUID, dataclasses...)
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.pop('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs:
+            # indent, separators u otras opciones del json estandar
+            return super().dumps(obj, sort_keys=bool(option & orjson.OPT_SORT_KEYS), **kwargs)
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # En debug la respuesta va con indentacion, como la de Flask
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj) + '\n', mimetype=self.mimetype)
+
+def setup_json(app):
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
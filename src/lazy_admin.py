@@ -0,0 +1,45 @@
+import threading
+from flask import Flask
+from config import configure_database
+from models import db
+
+ADMIN_MODES = ('lazy', 'eager', 'off')
+
+def create_admin_app():
+    # Flask-Admin en una app aparte, con su propia conexion a la misma db; los cambios
+    # siguen invalidando la cache del proceso (ver admin.CachedModelView)
+    from admin import setup_admin
+    admin_app = Flask(__name__)
+    configure_database(admin_app)
+    db.init_app(admin_app)
+    setup_admin(admin_app)
+    return admin_app
+
+class LazyAdmin:
+    # Middleware WSGI: /admin va a la app del admin, que se arma con el primer request;
+    # el resto sigue a la API. Asi el arranque no paga Flask-Admin, WTForms ni sus vistas
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._admin_app = None
+        self._lock = threading.Lock()
+
+    def get_admin_app(self):
+        with self._lock:
+            if self._admin_app is None:
+                self._admin_app = create_admin_app()
+        return self._admin_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == '/admin' or path.startswith('/admin/'):
+            return self.get_admin_app()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+def mount_admin(app, mode):
+    if mode not in ADMIN_MODES:
+        raise ValueError('ADMIN_MODE must be one of: ' + ', '.join(ADMIN_MODES))
+    if mode == 'eager':
+        from admin import setup_admin
+        setup_admin(app)
+    elif mode == 'lazy':
+        app.wsgi_app = LazyAdmin(app.wsgi_app)
@@ -0,0 +1,251 @@
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request, Response
+from cache import entity_cache
+from compression import compressed_cache
+from config import get_pool_stats
+
+# Limites (en segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Con METRICS_DIR cada proceso (worker de gunicorn) vuelca sus metricas a un archivo
+# y /metrics suma los archivos de todos los procesos
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
+# Contadores acumulados de los workers que ya terminaron (ver mark_process_dead)
+AGGREGATE_FILE = 'metrics_aggregate.json'
+# Estadisticas de cache que son contadores; el resto (entries, max_entries) son gauges
+CACHE_COUNTERS = ('hits', 'misses', 'evictions')
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.queries = {}
+        self.in_flight = 0
+        self._last_flush = 0.0
+        self._pending_flush = False
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, endpoint, method, status, elapsed, query_count):
+        key = '\t'.join((endpoint, method, str(status)))
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.setdefault(endpoint, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += elapsed
+            histogram["count"] += 1
+            self.queries[endpoint] = self.queries.get(endpoint, 0) + query_count
+
+    def snapshot(self, engine):
+        with self._lock:
+            state = {
+                "pid": os.getpid(),
+                "requests": dict(self.requests),
+                "latency": {endpoint: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                            for endpoint, h in self.latency.items()},
+                "queries": dict(self.queries),
+                "in_flight": self.in_flight
+            }
+        state["pool"] = get_pool_stats(engine)
+        state["caches"] = {"entity": entity_cache.stats(), "compressed": compressed_cache.stats()}
+        return state
+
+    def flush(self, engine, force=False):
+        # Escritura atomica (archivo temporal + rename), como mucho una vez por FLUSH_INTERVAL;
+        # si todavia no toca, se programa una escritura para que un worker inactivo no se quede atras
+        if METRICS_DIR is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            with self._lock:
+                if self._pending_flush:
+                    return
+                self._pending_flush = True
+            timer = threading.Timer(FLUSH_INTERVAL, self.flush, args=(engine, True))
+            timer.daemon = True
+            timer.start()
+            return
+        with self._lock:
+            self._pending_flush = False
+        self._last_flush = now
+        path = os.path.join(METRICS_DIR, 'metrics_%d.json' % os.getpid())
+        try:
+            write_state(path, self.snapshot(engine))
+        except OSError:
+            pass
+
+registry = MetricsRegistry()
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_state(path, state):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def dead_counters(state):
+    # De un worker muerto se conservan los contadores, no sus gauges
+    state = dict(state, in_flight=0, pool={})
+    state["caches"] = {name: {key: value for key, value in stats.items() if key in CACHE_COUNTERS}
+                       for name, stats in state.get("caches", {}).items()}
+    return state
+
+def collect_states(engine):
+    # El estado de este proceso se toma en vivo, el de los demas de sus archivos
+    own = registry.snapshot(engine)
+    if METRICS_DIR is None:
+        return [own]
+    states = [own]
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json')):
+        state = read_state(path)
+        if state is None or state.get("pid") == own["pid"]:
+            continue
+        if state.get("pid") is not None and not process_alive(state["pid"]):
+            state = dead_counters(state)
+        states.append(state)
+    return states
+
+def mark_process_dead(pid, metrics_dir=None):
+    # Lo llama el master de gunicorn (child_exit) cuando termina un worker: sus contadores se suman
+    # al archivo agregado y se borra su archivo, asi la carpeta no crece con cada reinicio
+    # (max_requests) y un worker nuevo con el mismo pid no pisa contadores ya contados
+    metrics_dir = metrics_dir or METRICS_DIR
+    if metrics_dir is None:
+        return
+    path = os.path.join(metrics_dir, 'metrics_%d.json' % pid)
+    state = read_state(path)
+    if state is not None:
+        aggregate_path = os.path.join(metrics_dir, AGGREGATE_FILE)
+        states = [dead_counters(state)]
+        aggregate = read_state(aggregate_path)
+        if aggregate is not None:
+            states.append(aggregate)
+        write_state(aggregate_path, dict(merge_states(states), pid=None))
+    for leftover in (path, path + '.tmp'):
+        try:
+            os.remove(leftover)
+        except OSError:
+            pass
+
+def merge_states(states):
+    merged = {"requests": {}, "latency": {}, "queries": {}, "in_flight": 0, "pool": {}, "caches": {}}
+    for state in states:
+        for key, count in state["requests"].items():
+            merged["requests"][key] = merged["requests"].get(key, 0) + count
+        for endpoint, histogram in state["latency"].items():
+            total = merged["latency"].setdefault(endpoint, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+            total["buckets"] = [a + b for a, b in zip(total["buckets"], histogram["buckets"])]
+            total["sum"] += histogram["sum"]
+            total["count"] += histogram["count"]
+        for endpoint, count in state["queries"].items():
+            merged["queries"][endpoint] = merged["queries"].get(endpoint, 0) + count
+        merged["in_flight"] += state["in_flight"]
+        for name, value in state["pool"].items():
+            if isinstance(value, int):
+                merged["pool"][name] = merged["pool"].get(name, 0) + value
+        for cache_name, stats in state["caches"].items():
+            total = merged["caches"].setdefault(cache_name, {})
+            for name, value in stats.items():
+                total[name] = total.get(name, 0) + value
+    return merged
+
+def labels(**values):
+    return '{' + ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in values.items()) + '}'
+
+def render_metrics(merged):
+    lines = [
+        '# HELP api_requests_total Requests handled, by endpoint, method and status.',
+        '# TYPE api_requests_total counter'
+    ]
+    for key, count in sorted(merged["requests"].items()):
+        endpoint, method, status = key.split('\t')
+        lines.append('api_requests_total%s %d' % (labels(endpoint=endpoint, method=method, status=status), count))
+
+    lines += ['# HELP api_request_duration_seconds Request latency, by endpoint.',
+              '# TYPE api_request_duration_seconds histogram']
+    for endpoint, histogram in sorted(merged["latency"].items()):
+        for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+            lines.append('api_request_duration_seconds_bucket%s %d' % (labels(endpoint=endpoint, le=bound), count))
+        lines.append('api_request_duration_seconds_bucket%s %d' % (labels(endpoint=endpoint, le='+Inf'), histogram["count"]))
+        lines.append('api_request_duration_seconds_sum%s %.6f' % (labels(endpoint=endpoint), histogram["sum"]))
+        lines.append('api_request_duration_seconds_count%s %d' % (labels(endpoint=endpoint), histogram["count"]))
+
+    lines += ['# HELP api_db_queries_total SQL statements executed, by endpoint.',
+              '# TYPE api_db_queries_total counter']
+    for endpoint, count in sorted(merged["queries"].items()):
+        lines.append('api_db_queries_total%s %d' % (labels(endpoint=endpoint), count))
+
+    lines += ['# HELP api_requests_in_flight Requests being handled right now.',
+              '# TYPE api_requests_in_flight gauge',
+              'api_requests_in_flight %d' % merged["in_flight"]]
+
+    lines += ['# HELP api_db_pool_connections Database pool connections, summed over all workers.',
+              '# TYPE api_db_pool_connections gauge']
+    for name, value in sorted(merged["pool"].items()):
+        lines.append('api_db_pool_connections%s %d' % (labels(state=name), value))
+
+    for name, kind, help_text in (('hits', 'counter', 'Cache hits.'), ('misses', 'counter', 'Cache misses.'),
+                                  ('evictions', 'counter', 'Cache evictions.'), ('entries', 'gauge', 'Cache entries.')):
+        metric = 'api_cache_%s' % name + ('_total' if kind == 'counter' else '')
+        lines += ['# HELP %s %s' % (metric, help_text), '# TYPE %s %s' % (metric, kind)]
+        for cache_name, stats in sorted(merged["caches"].items()):
+            lines.append('%s%s %d' % (metric, labels(cache=cache_name), stats.get(name, 0)))
+    lines += ['# HELP api_cache_hit_ratio Cache hits over lookups.', '# TYPE api_cache_hit_ratio gauge']
+    for cache_name, stats in sorted(merged["caches"].items()):
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        ratio = stats.get('hits', 0) / lookups if lookups else 0.0
+        lines.append('api_cache_hit_ratio%s %.4f' % (labels(cache=cache_name), ratio))
+    return '\n'.join(lines) + '\n'
+
+def setup_metrics(app, db):
+    if METRICS_DIR is not None:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+
+    @app.before_request
+    def start_metrics():
+        g.metrics_start = time.perf_counter()
+        registry.request_started()
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_metrics(exc):
+        if 'metrics_start' not in g:
+            return
+        status = g.get('metrics_status', 500)
+        registry.request_finished(request.endpoint or 'unmatched', request.method, status,
+                                  time.perf_counter() - g.metrics_start, g.get('sql_count', 0))
+        registry.flush(db.engine)
+
+    @app.route('/metrics')
+    def metrics():
+        merged = merge_states(collect_states(db.engine))
+        return Response(render_metrics(merged), content_type='text/plain; version=0.0.4; charset=utf-8')
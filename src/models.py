@@ -1,12 +1,25 @@
+import math
+import re
+from collections import Counter
+from itertools import chain
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, literal, literal_column, or_, select, text, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 
 db = SQLAlchemy()
 
+# Tablas que casi no cambian y cuyo numero de version se usa para los ETag
+VERSIONED_TABLES = ('user', 'character', 'planet', 'vehicle')
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(80), unique=False, nullable=False)
+    # Columnas que se pueden exponer (las mismas que serialize), ver utils.public_fields
+    public_columns = ('id', 'name', 'email')
     favorite_characters = db.relationship('Favorite_character', backref='user', lazy=True)
     favorite_vehicles = db.relationship('Favorite_vehicle', backref='user', lazy=True)
     favorite_planets = db.relationship('Favorite_planet', backref='user', lazy=True)
@@ -27,6 +40,9 @@ class Favorite_character(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False)
+    # Un usuario no puede repetir un favorito; el indice tambien sirve para buscar por user_id
+    # En SQLite sin AUTOINCREMENT se reusa max(id) + 1 y el watermark de get_favorites_watermark no cambiaria
+    __table_args__ = (db.Index('ix_favorite_character_user_id_character_id', 'user_id', 'character_id', unique=True), {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return '<Favorite_character %r>' % self.id
@@ -49,6 +65,21 @@ class Character(db.Model):
     eye_color = db.Column(db.String(120), nullable=False)
     birth_year = db.Column(db.String(120), nullable=False)
     gender = db.Column(db.String(120), nullable=False)
+    # Copias numericas de las columnas de texto ("unknown" queda en NULL), para filtrar y ordenar en SQL
+    height_num = db.Column(db.Float)
+    mass_num = db.Column(db.Float)
+    numeric_columns = {'height': 'height_num', 'mass': 'mass_num'}
+    # Cuantos usuarios lo tienen en favoritos; se actualiza en la misma transaccion que el favorito
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Ranking (/characters/top): ORDER BY favorite_count DESC, id DESC LIMIT k recorre este indice
+    # Listados con ?sort= (ver utils.keyset_phases): cada (columna, id) sirve el ORDER BY y el cursor
+    # en el orden del indice; tambien sirven a los `?filter=` sobre las columnas numericas
+    __table_args__ = (
+        db.Index('ix_character_favorite_count_id', 'favorite_count', 'id'),
+        db.Index('ix_character_name_id', 'name', 'id'),
+        db.Index('ix_character_height_num_id', 'height_num', 'id'),
+        db.Index('ix_character_mass_num_id', 'mass_num', 'id'),
+    )
     favorite_characters = db.relationship('Favorite_character', backref='character', lazy=True)
     # planet_id = db.Column(db.Integer, db.ForeignKey('planet.id'), nullable=False) #planet-character
     # vehicles = db.relationship('Vehicles', backref='character', lazy=True) #character-vehicle
@@ -73,6 +104,9 @@ class Favorite_vehicle(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
+    # Un usuario no puede repetir un favorito; el indice tambien sirve para buscar por user_id
+    # En SQLite sin AUTOINCREMENT se reusa max(id) + 1 y el watermark de get_favorites_watermark no cambiaria
+    __table_args__ = (db.Index('ix_favorite_vehicle_user_id_vehicle_id', 'user_id', 'vehicle_id', unique=True), {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return '<Favorite_vehicle %r>' % self.id
@@ -96,6 +130,20 @@ class Vehicle(db.Model):
     cargo_capacity = db.Column(db.String(120), nullable=False)
     vehicle_class= db.Column(db.String(120), nullable=False)
     manufacturer= db.Column(db.String(120), nullable=False)
+    cost_in_credits_num = db.Column(db.Float)
+    cargo_capacity_num = db.Column(db.Float)
+    numeric_columns = {'cost_in_credits': 'cost_in_credits_num', 'cargo_capacity': 'cargo_capacity_num'}
+    # Cuantos usuarios lo tienen en favoritos; se actualiza en la misma transaccion que el favorito
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Ranking (/vehicles/top): ORDER BY favorite_count DESC, id DESC LIMIT k recorre este indice
+    # Listados con ?sort= (ver utils.keyset_phases): cada (columna, id) sirve el ORDER BY y el cursor
+    # en el orden del indice; tambien sirven a los `?filter=` sobre las columnas numericas
+    __table_args__ = (
+        db.Index('ix_vehicle_favorite_count_id', 'favorite_count', 'id'),
+        db.Index('ix_vehicle_name_id', 'name', 'id'),
+        db.Index('ix_vehicle_cost_in_credits_num_id', 'cost_in_credits_num', 'id'),
+        db.Index('ix_vehicle_cargo_capacity_num_id', 'cargo_capacity_num', 'id'),
+    )
     favorite_vehicles = db.relationship('Favorite_vehicle', backref='vehicle', lazy=True)
     # character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False) #character-vehicle
     def __repr__(self):
@@ -120,6 +168,9 @@ class Favorite_planet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     planet_id = db.Column(db.Integer, db.ForeignKey('planet.id'), nullable=False)
+    # Un usuario no puede repetir un favorito; el indice tambien sirve para buscar por user_id
+    # En SQLite sin AUTOINCREMENT se reusa max(id) + 1 y el watermark de get_favorites_watermark no cambiaria
+    __table_args__ = (db.Index('ix_favorite_planet_user_id_planet_id', 'user_id', 'planet_id', unique=True), {'sqlite_autoincrement': True})
     def __repr__(self):
         return '<Favorite_planet %r>' % self.id
 
@@ -142,6 +193,20 @@ class Planet(db.Model):
     terrain = db.Column(db.String(120), nullable=False)
     surface_water = db.Column(db.String(120), nullable=False)
     population = db.Column(db.String(120), nullable=False)
+    diameter_num = db.Column(db.Float)
+    population_num = db.Column(db.Float)
+    numeric_columns = {'diameter': 'diameter_num', 'population': 'population_num'}
+    # Cuantos usuarios lo tienen en favoritos; se actualiza en la misma transaccion que el favorito
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Ranking (/planets/top): ORDER BY favorite_count DESC, id DESC LIMIT k recorre este indice
+    # Listados con ?sort= (ver utils.keyset_phases): cada (columna, id) sirve el ORDER BY y el cursor
+    # en el orden del indice; tambien sirven a los `?filter=` sobre las columnas numericas
+    __table_args__ = (
+        db.Index('ix_planet_favorite_count_id', 'favorite_count', 'id'),
+        db.Index('ix_planet_name_id', 'name', 'id'),
+        db.Index('ix_planet_diameter_num_id', 'diameter_num', 'id'),
+        db.Index('ix_planet_population_num_id', 'population_num', 'id'),
+    )
     favorite_planets = db.relationship('Favorite_planet', backref='planet', lazy=True)
     # characters = db.relationship('Character', backref='planet', lazy=True) #planet-character
     def __repr__(self):
@@ -160,5 +225,297 @@ class Planet(db.Model):
             "surface_water": self.surface_water,
             "population": self.population,
         }
-    
 
+class Table_version(db.Model):
+    # Contador de cambios por tabla, se incrementa en cada flush que la toca
+    name = db.Column(db.String(80), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<Table_version %r>' % self.name
+
+    def serialize(self):
+        return {
+            "name": self.name,
+            "version": self.version
+        }
+
+def bump_table_versions(connection, names):
+    table = Table_version.__table__
+    for name in sorted(names):
+        result = connection.execute(table.update().where(table.c.name == name).values(version = table.c.version + 1))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name = name, version = 1))
+
+def get_table_versions(*names):
+    rows = db.session.query(Table_version.name, Table_version.version).filter(Table_version.name.in_(names)).all()
+    versions = dict(rows)
+    return tuple(versions.get(name, 0) for name in names)
+
+def get_favorites_watermark(user_id):
+    # Los favoritos solo se insertan o se borran y los ids nunca se reusan (secuencias en Postgres,
+    # AUTOINCREMENT en SQLite), asi que (count, max(id)) por tabla cambia con cualquier modificacion;
+    # todo sale en un solo SELECT
+    columns = []
+    for model in (Favorite_character, Favorite_planet, Favorite_vehicle):
+        columns.append(select(func.count(model.id)).where(model.user_id == user_id).scalar_subquery())
+        columns.append(select(func.max(model.id)).where(model.user_id == user_id).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one())
+
+# (tipo, modelo de favorito, columna del favorito, modelo de la entidad)
+FAVORITE_KINDS = (
+    ('character', Favorite_character, Favorite_character.character_id, Character),
+    ('planet', Favorite_planet, Favorite_planet.planet_id, Planet),
+    ('vehicle', Favorite_vehicle, Favorite_vehicle.vehicle_id, Vehicle)
+)
+
+# Modelo de favorito -> modelo de la entidad, para actualizar su favorite_count
+FAVORITE_ENTITIES = {fav_model: entity_model for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS}
+
+def increment_favorite_counts(entity_model, entity_ids, delta=1):
+    # UPDATE ... SET favorite_count = favorite_count + delta: atomico, sin leer el valor antes
+    table = entity_model.__table__
+    db.session.execute(table.update().where(table.c.id.in_(entity_ids)).values(favorite_count = table.c.favorite_count + delta))
+
+def decrement_favorited_counts(entity_column, entity_model, *conditions):
+    # Resta 1 a cada entidad de los favoritos que cumplen `conditions`, hay que llamarla antes del DELETE
+    table = entity_model.__table__
+    favorited = select(entity_column).where(*conditions)
+    db.session.execute(table.update().where(table.c.id.in_(favorited)).values(favorite_count = table.c.favorite_count - 1))
+
+def get_top_entities(entity_model, limit):
+    return db.session.query(entity_model.id, entity_model.name, entity_model.favorite_count) \
+        .filter(entity_model.favorite_count > 0) \
+        .order_by(entity_model.favorite_count.desc(), entity_model.id.desc()) \
+        .limit(limit).all()
+
+def reconcile_favorite_counts():
+    # Recalcula todos los contadores con un UPDATE por tabla (subconsulta correlacionada con COUNT)
+    # y devuelve cuantas filas estaban desfasadas
+    fixed = {}
+    for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS:
+        table = entity_model.__table__
+        actual = select(func.count()).where(entity_column == table.c.id).scalar_subquery()
+        result = db.session.execute(table.update().where(table.c.favorite_count != actual).values(favorite_count = actual))
+        fixed[kind] = result.rowcount
+    return fixed
+
+def get_user_favorites(user_id):
+    # Un solo SELECT: el usuario con LEFT JOIN a la union de sus tres tablas de favoritos,
+    # cada favorito ya viene con el nombre de la entidad
+    favorites = union_all(*[
+        select(
+            literal(kind).label('kind'),
+            fav_model.id.label('id'),
+            fav_model.user_id.label('user_id'),
+            entity_column.label('entity_id'),
+            entity_model.name.label('name')
+        ).join(entity_model, entity_model.id == entity_column).where(fav_model.user_id == user_id)
+        for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS
+    ]).subquery()
+    query = select(User.id.label('user_id'), favorites.c.kind, favorites.c.id.label('favorite_id'), favorites.c.entity_id, favorites.c.name) \
+        .outerjoin(favorites, favorites.c.user_id == User.id) \
+        .where(User.id == user_id) \
+        .order_by(favorites.c.kind, favorites.c.id)
+    rows = db.session.execute(query).all()
+    if not rows:
+        return None
+    return [row for row in rows if row.kind is not None]
+
+def insert_ignore(table, index_elements):
+    # INSERT que ignora las filas repetidas
+    # (ON CONFLICT DO NOTHING en Postgres/SQLite, INSERT IGNORE en MySQL)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'sqlite':
+        return sqlite_insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'mysql':
+        return table.insert().prefix_with('IGNORE')
+    return table.insert()
+
+def insert_favorite(fav_model, entity_field, user_id, entity_id):
+    # INSERT idempotente: si el favorito ya existe no se inserta otra fila
+    values = {'user_id': user_id, entity_field: entity_id}
+    statement = insert_ignore(fav_model.__table__, ['user_id', entity_field]).values(**values)
+    result = db.session.execute(statement)
+    created = result.rowcount == 1
+    if created:
+        favorite_id = result.inserted_primary_key[0]
+        increment_favorite_counts(FAVORITE_ENTITIES[fav_model], [entity_id])
+    else:
+        favorite_id = db.session.query(fav_model.id).filter_by(**values).scalar()
+    return {"id": favorite_id, "user_id": user_id, entity_field: entity_id}, created
+
+def insert_favorites_batch(items):
+    # Varios insert_favorite de distintos requests en una sola transaccion (ver group_commit.py).
+    # items: [(modelo de favorito, columna, user_id, entity_id)]; devuelve [(favorito, creado)] en el mismo orden
+    results = [None] * len(items)
+    indexes_by_model = {}
+    for index, item in enumerate(items):
+        indexes_by_model.setdefault(item[0], []).append(index)
+    for fav_model, indexes in indexes_by_model.items():
+        entity_field = items[indexes[0]][1]
+        table = fav_model.__table__
+        pairs = list(dict.fromkeys((items[index][2], items[index][3]) for index in indexes))
+
+        def find_ids():
+            query = select(table.c.user_id, table.c[entity_field], table.c.id) \
+                .where(tuple_(table.c.user_id, table.c[entity_field]).in_(pairs))
+            return {(row[0], row[1]): row[2] for row in db.session.execute(query)}
+
+        # SELECT de los que ya existen, un INSERT multi-fila con el resto y otro SELECT para los ids nuevos
+        existing = find_ids()
+        new_pairs = [pair for pair in pairs if pair not in existing]
+        ids = existing
+        if new_pairs:
+            db.session.execute(insert_ignore(table, ['user_id', entity_field]),
+                               [{'user_id': user_id, entity_field: entity_id} for user_id, entity_id in new_pairs])
+            ids = find_ids()
+            # Una misma entidad puede sumar varios favoritos en el lote: un UPDATE por cada incremento distinto
+            counts = Counter(entity_id for user_id, entity_id in new_pairs)
+            for delta in set(counts.values()):
+                increment_favorite_counts(FAVORITE_ENTITIES[fav_model], [entity_id for entity_id, count in counts.items() if count == delta], delta)
+
+        seen = set()
+        for index in indexes:
+            pair = (items[index][2], items[index][3])
+            results[index] = ({"id": ids.get(pair), "user_id": pair[0], entity_field: pair[1]}, pair not in existing and pair not in seen)
+            seen.add(pair)
+    return results
+
+def get_existing_entities(ids_by_kind):
+    # Valida todos los ids de una vez: un solo SELECT ... WHERE id IN (...) por tipo, unidos con UNION ALL
+    queries = [
+        select(literal(kind).label('kind'), entity_model.id).where(entity_model.id.in_(ids_by_kind[kind]))
+        for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS if ids_by_kind.get(kind)
+    ]
+    if not queries:
+        return set()
+    return {(row.kind, row.id) for row in db.session.execute(union_all(*queries))}
+
+def get_existing_favorites(user_id, ids_by_kind):
+    queries = [
+        select(literal(kind).label('kind'), entity_column.label('entity_id'))
+        .where(fav_model.user_id == user_id, entity_column.in_(ids_by_kind[kind]))
+        for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS if ids_by_kind.get(kind)
+    ]
+    if not queries:
+        return set()
+    return {(row.kind, row.entity_id) for row in db.session.execute(union_all(*queries))}
+
+def bulk_insert_favorites(user_id, ids_by_kind):
+    # Un INSERT multi-fila (executemany) por tipo, todo dentro de la misma transaccion
+    for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS:
+        if ids_by_kind.get(kind):
+            statement = insert_ignore(fav_model.__table__, ['user_id', entity_column.key])
+            db.session.execute(statement, [{'user_id': user_id, entity_column.key: entity_id} for entity_id in ids_by_kind[kind]])
+            # Se suman los ids que se calcularon como nuevos; si otro request inserto el mismo favorito
+            # entre medio, el contador queda corrido en 1 hasta el siguiente `flask reconcile-favorite-counts`
+            increment_favorite_counts(entity_model, ids_by_kind[kind])
+
+def bulk_delete_favorites(user_id, ids_by_kind):
+    for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS:
+        if ids_by_kind.get(kind):
+            table = fav_model.__table__
+            conditions = (table.c.user_id == user_id, table.c[entity_column.key].in_(ids_by_kind[kind]))
+            decrement_favorited_counts(table.c[entity_column.key], entity_model, *conditions)
+            db.session.execute(table.delete().where(*conditions))
+
+def delete_user_favorites(user_id):
+    # Antes de borrar un usuario: sus favoritos se borran y se descuentan de los contadores
+    for kind, fav_model, entity_column, entity_model in FAVORITE_KINDS:
+        table = fav_model.__table__
+        decrement_favorited_counts(table.c[entity_column.key], entity_model, table.c.user_id == user_id)
+        db.session.execute(table.delete().where(table.c.user_id == user_id))
+
+def delete_favorite(fav_model, entity_field, user_id, entity_id):
+    # Un solo DELETE, sin buscar antes el usuario, la entidad ni el favorito
+    table = fav_model.__table__
+    result = db.session.execute(table.delete().where(table.c.user_id == user_id, table.c[entity_field] == entity_id))
+    if result.rowcount > 0:
+        increment_favorite_counts(FAVORITE_ENTITIES[fav_model], [entity_id], -1)
+    return result.rowcount > 0
+
+def user_and_entity_exist(user_id, entity_model, entity_id):
+    # Ambas verificaciones en un solo SELECT
+    user_exists = select(User.id).where(User.id == user_id).exists()
+    entity_exists = select(entity_model.id).where(entity_model.id == entity_id).exists()
+    row = db.session.execute(select(user_exists, entity_exists)).one()
+    return row[0] and row[1]
+
+# Texto buscable de cada entidad para /search, igual al de la migracion de los indices
+SEARCH_DOCUMENTS = (
+    ('character', Character, ('name',)),
+    ('planet', Planet, ('name',)),
+    ('vehicle', Vehicle, ('name', 'model', 'manufacturer'))
+)
+
+def search_document(model, columns):
+    # name || ' ' || model || ...: con literales (no parametros) para que coincida con el indice
+    document = getattr(model, columns[0])
+    for column in columns[1:]:
+        document = document.op('||')(literal_column("' '")).op('||')(getattr(model, column))
+    return document
+
+def search_catalog(q, limit):
+    # Busqueda por nombre con ranking: tsvector + indice GIN en Postgres, FTS5 en SQLite
+    terms = re.findall(r'\w+', q)[:8]
+    if not terms:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        tsquery = func.to_tsquery(literal_column("'simple'"), ' & '.join(term + ':*' for term in terms))
+        queries = []
+        for kind, model, columns in SEARCH_DOCUMENTS:
+            tsvector = func.to_tsvector(literal_column("'simple'"), search_document(model, columns))
+            queries.append(
+                select(literal(kind).label('kind'), model.id.label('id'), model.name.label('name'),
+                       func.ts_rank(tsvector, tsquery).label('rank'))
+                .where(tsvector.op('@@')(tsquery))
+            )
+        search = union_all(*queries).subquery()
+        statement = select(search.c.kind, search.c.id, search.c.name).order_by(search.c.rank.desc(), search.c.id).limit(limit)
+        return db.session.execute(statement).all()
+    if dialect == 'sqlite':
+        match = ' '.join('"%s"*' % term for term in terms)
+        statement = text(
+            "SELECT kind, entity_id AS id, name FROM search_index "
+            "WHERE search_index MATCH :match ORDER BY bm25(search_index) LIMIT :limit"
+        )
+        return db.session.execute(statement, {'match': match, 'limit': limit}).all()
+    # Otros motores: LIKE sin indice, solo como respaldo
+    queries = []
+    for kind, model, columns in SEARCH_DOCUMENTS:
+        conditions = [getattr(model, column).ilike('%' + term + '%') for term in terms for column in columns]
+        queries.append(select(literal(kind).label('kind'), model.id.label('id'), model.name.label('name')).where(or_(*conditions)))
+    search = union_all(*queries).subquery()
+    return db.session.execute(select(search).order_by(search.c.name).limit(limit)).all()
+
+def parse_number(value):
+    # "1,358" -> 1358.0; "unknown", "n/a" o rangos como "30-165" -> None
+    if value is None:
+        return None
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+def sync_numeric_columns(mapper, connection, target):
+    for column, numeric_column in target.numeric_columns.items():
+        setattr(target, numeric_column, parse_number(getattr(target, column)))
+
+for catalog_model in (Character, Planet, Vehicle):
+    event.listen(catalog_model, 'before_insert', sync_numeric_columns)
+    event.listen(catalog_model, 'before_update', sync_numeric_columns)
+
+@event.listens_for(Session, 'after_flush')
+def track_table_versions(session, flush_context):
+    names = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None and table.name in VERSIONED_TABLES:
+            names.add(table.name)
+    if names:
+        bump_table_versions(session.connection(), names)
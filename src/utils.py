@@ -1,4 +1,38 @@
-from flask import jsonify, url_for
+import base64
+import hashlib
+import json
+import re
+from flask import current_app, jsonify, url_for, request, Response, stream_with_context
+from sqlalchemy import and_, tuple_
+
+# Tamaño de pagina por defecto y maximo permitido para los listados
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Maximo de ids que se aceptan en `?ids=` (multi-get)
+MAX_IDS = 100
+# Filas que se leen de la db por cada vuelta cuando se hace streaming
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Resultados de /search por defecto y maximo
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+# Maximo de favoritos que se aceptan en un solo request de /favorites/bulk
+MAX_BULK_FAVORITES = 500
+FAVORITE_FIELDS = ('character_id', 'planet_id', 'vehicle_id')
+# Columnas de personajes, planetas y vehiculos que mantiene la app (ver /<tipo>/top)
+INTERNAL_COLUMNS = ('favorite_count',)
+# Largo maximo de los rankings de /<tipo>/top
+MAX_TOP_LIMIT = 100
+# population>1000000000, mass<=80, diameter!=0 ...
+FILTER_PATTERN = re.compile(r'^(\w+)(>=|<=|!=|=|>|<)(.+)$')
+FILTER_OPERATORS = {
+    '=': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value
+}
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +49,270 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    # El cursor es una lista: [ultimo id] o [ultimo valor ordenado, ultimo id]
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError:
+        raise APIException('Invalid cursor', status_code=400)
+    if not isinstance(values, list) or not values or not isinstance(values[-1], int) or isinstance(values[-1], bool):
+        raise APIException('Invalid cursor', status_code=400)
+    return values
+
+def is_cursor_value(column, value):
+    # Valor de la columna ordenada dentro del cursor: NULL, texto si la columna es de texto
+    # (name) o numero si es numerica (id y las copias `*_num`)
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if column.type.python_type is str:
+        return isinstance(value, str)
+    return isinstance(value, (int, float))
+
+def get_int_arg(name, default, minimum, message):
+    # Con `type=int` Flask devuelve el default cuando el valor no es un entero (`?limit=abc`);
+    # aqui se lee el texto crudo para responder 400 en vez de ignorarlo
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise APIException(message, status_code=400)
+    if value < minimum:
+        raise APIException(message, status_code=400)
+    return value
+
+def get_page_args(sort=None):
+    # Lee `limit` y `after` del query string, el limite nunca pasa de MAX_PAGE_SIZE.
+    # El cursor tiene que corresponder al orden pedido (`sort`, ver get_sort_arg)
+    limit = min(get_int_arg('limit', DEFAULT_PAGE_SIZE, 1, 'limit must be a positive integer'), MAX_PAGE_SIZE)
+    after = request.args.get('after')
+    after = decode_cursor(after) if after else None
+    if after is not None:
+        if sort is None and len(after) != 1:
+            raise APIException('Invalid cursor', status_code=400)
+        if sort is not None and (len(after) != 2 or not is_cursor_value(sort[0], after[0])):
+            raise APIException('Invalid cursor', status_code=400)
+    return limit, after
+
+def get_ids_arg():
+    # `ids=1,5,9` -> [1, 5, 9], sin repetidos y en el orden pedido; None si no vino el parametro
+    ids = request.args.get('ids')
+    if ids is None:
+        return None
+    try:
+        requested = list(dict.fromkeys(int(id) for id in ids.split(',') if id.strip()))
+    except ValueError:
+        raise APIException('ids must be a comma separated list of integers', status_code=400)
+    if not requested:
+        raise APIException('Please enter at least one id', status_code=400)
+    if len(requested) > MAX_IDS:
+        raise APIException('At most %d ids per request' % MAX_IDS, status_code=400)
+    return requested
+
+def fetch_by_ids(query, model, ids, fields=None, filters=()):
+    # Un solo `WHERE id IN (...)`; las filas se devuelven en el orden de `ids` junto con los ids
+    # que no existen y los que existen pero no cumplen `filters` (de get_filter_arg). El filtro va
+    # como columna (`matches`) y no en el WHERE, para distinguir un caso del otro en la misma consulta
+    query, fields = select_columns(query.filter(model.id.in_(ids)), model, fields)
+    if filters:
+        query = query.add_columns(and_(*filters).label('matches'))
+    found = {}
+    filtered = set()
+    for row in query:
+        if filters and not row.matches:
+            filtered.add(row.id)
+        else:
+            found[row.id] = serialize_row(row, fields)
+    missing = [id for id in ids if id not in found and id not in filtered]
+    return [found[id] for id in ids if id in found], missing, [id for id in ids if id in filtered]
+
+def get_top_limit_arg():
+    return min(get_int_arg('limit', DEFAULT_PAGE_SIZE, 1, 'limit must be a positive integer'), MAX_TOP_LIMIT)
+
+def get_filter_arg(model):
+    # `filter=population>1000000000,diameter<=12000` -> predicados sobre las columnas numericas indexadas
+    filters = request.args.get('filter')
+    if not filters:
+        return []
+    numeric_columns = getattr(model, 'numeric_columns', {})
+    predicates = []
+    for condition in filters.split(','):
+        match = FILTER_PATTERN.match(condition.strip())
+        if not match or (match.group(1) != 'id' and match.group(1) not in numeric_columns):
+            raise APIException('Invalid filter: ' + condition, status_code=400)
+        field, operator, value = match.groups()
+        try:
+            value = float(value)
+        except ValueError:
+            raise APIException('Invalid filter value: ' + condition, status_code=400)
+        column = model.id if field == 'id' else getattr(model, numeric_columns[field])
+        predicates.append(FILTER_OPERATORS[operator](column, value))
+    return predicates
+
+def get_sort_arg(model):
+    # `sort=population` o `sort=-population` (descendente); devuelve (columna, descendente) o None
+    sort = request.args.get('sort')
+    if not sort:
+        return None
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    numeric_columns = getattr(model, 'numeric_columns', {})
+    if field in numeric_columns:
+        column = getattr(model, numeric_columns[field])
+    elif field in ('id', 'name'):
+        column = getattr(model, field)
+    else:
+        raise APIException('Invalid sort field: ' + field, status_code=400)
+    if column is model.id and not descending:
+        return None
+    return column, descending
+
+def paginate(query, model, limit, after=None, sort=None):
+    # Keyset pagination: por defecto sobre la llave primaria, o sobre (columna ordenada, id).
+    # Cada fase de keyset_phases se lee en el orden de un indice, asi una pagina cuesta lo mismo
+    # al principio que al final. `after` ya viene validado por get_page_args
+    items = []
+    for conditions, order in keyset_phases(model, sort, after):
+        items += query.filter(*conditions).order_by(*order).limit(limit + 1 - len(items)).all()
+        if len(items) > limit:
+            break
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([last.id] if sort is None else [getattr(last, sort[0].key), last.id])
+    return items, next_cursor
+
+def keyset_phases(model, sort=None, after=None):
+    # Lista de (condiciones, ORDER BY) que recorren el listado completo, desde `after` si viene.
+    # Con `sort` primero van las filas con valor, en el orden del indice (columna, id), y despues,
+    # si la columna admite NULL, las filas sin valor por id. En descendente el desempate tambien
+    # es por id descendente, para que todo el ORDER BY sea el indice recorrido al reves
+    if sort is None:
+        return [([model.id > after[0]] if after else [], [model.id])]
+    column, descending = sort
+    ordered = (lambda column: column.desc()) if descending else (lambda column: column)
+    beyond = (lambda left, right: left < right) if descending else (lambda left, right: left > right)
+    if column is model.id:
+        return [([beyond(model.id, after[1])] if after else [], [ordered(model.id)])]
+    value, last_id = after if after else (None, None)
+    nullable = column.property.columns[0].nullable
+    phases = []
+    if after is None or value is not None:
+        conditions = [column.isnot(None)] if nullable else []
+        if after is not None:
+            conditions.append(beyond(tuple_(column, model.id), tuple_(value, last_id)))
+        phases.append((conditions, [ordered(column), ordered(model.id)]))
+    if nullable:
+        conditions = [column.is_(None)]
+        if after is not None and value is None:
+            conditions.append(beyond(model.id, last_id))
+        phases.append((conditions, [ordered(model.id)]))
+    return phases
+
+def public_fields(model):
+    # Las copias numericas (`*_num`) y los contadores son internos, no se exponen;
+    # un modelo con `public_columns` (User, sin el password) las declara explicitamente
+    if hasattr(model, 'public_columns'):
+        return list(model.public_columns)
+    hidden = set(getattr(model, 'numeric_columns', {}).values()) | set(INTERNAL_COLUMNS)
+    return [column for column in model.__table__.columns.keys() if column not in hidden]
+
+def get_fields_arg(model):
+    # Lee `fields=id,name` y valida que sean columnas del modelo, el id siempre va incluido
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    columns = public_fields(model)
+    invalid = [field for field in requested if field not in columns]
+    if invalid:
+        raise APIException('Invalid fields: ' + ', '.join(invalid), status_code=400)
+    if 'id' not in requested:
+        requested.insert(0, 'id')
+    return requested
+
+def select_columns(query, model, fields=None, sort=None):
+    # El SELECT trae solo las columnas pedidas como tuplas (Row), sin hidratar objetos del ORM;
+    # la columna de orden se agrega al final porque hace falta para armar el cursor
+    fields = fields or public_fields(model)
+    columns = [getattr(model, field) for field in fields]
+    if sort is not None and sort[0].key not in fields:
+        columns.append(sort[0])
+    return query.with_entities(*columns), fields
+
+def serialize_row(row, fields):
+    # zip corta en `fields`, asi la columna de orden extra no sale en la respuesta
+    return dict(zip(fields, row))
+
+def pick_fields(result, fields=None):
+    if fields is None:
+        return result
+    return {field: result.get(field) for field in fields}
+
+def get_bulk_favorites_args():
+    # Body: {"user_id": 1, "favorites": [{"character_id": 2}, {"planet_id": 5}, ...]}
+    body = request.get_json(silent=True) or {}
+    user_id = body.get('user_id')
+    items = body.get('favorites')
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise APIException('Please enter a user ID', status_code=400)
+    if not isinstance(items, list) or not items:
+        raise APIException('favorites must be a non empty list', status_code=400)
+    if len(items) > MAX_BULK_FAVORITES:
+        raise APIException('A maximum of %d favorites per request is allowed' % MAX_BULK_FAVORITES, status_code=400)
+    favorites = []
+    for item in items:
+        keys = [field for field in FAVORITE_FIELDS if isinstance(item, dict) and field in item]
+        entity_id = item[keys[0]] if len(keys) == 1 else None
+        if not isinstance(entity_id, int) or isinstance(entity_id, bool):
+            favorites.append((None, item))
+        else:
+            favorites.append((keys[0][:-len('_id')], entity_id))
+    return user_id, favorites
+
+def wants_stream():
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def stream_ndjson(query, model, fields, sort=None):
+    # Envia una fila serializada por linea a medida que llega de la db,
+    # sin construir la coleccion completa en memoria; respeta el mismo orden que paginate
+    dumps = current_app.json.dumps
+    def generate():
+        for conditions, order in keyset_phases(model, sort):
+            for row in query.filter(*conditions).order_by(*order).yield_per(STREAM_BATCH_SIZE):
+                yield dumps(serialize_row(row, fields)) + '\n'
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def make_etag(*versions):
+    # El ETag depende de la url completa (paginacion, fields) y de la version de los datos
+    digest = hashlib.sha1(request.full_path.encode())
+    for version in versions:
+        digest.update(repr(version).encode())
+    return digest.hexdigest()
+
+def not_modified(etag):
+    # Tambien acepta el ETag de la version comprimida (ver compression.py). El 304 devuelve el ETag
+    # de la representacion que tiene el cliente, como el 200; el Vary lo agrega compression.py
+    for tag in (etag, etag + '-gzip', etag + '-br'):
+        if request.if_none_match.contains(tag):
+            return with_etag(Response(status=304), tag)
+    return None
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -1,7 +1,10 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
-from app import app as application
+from app import create_app
+
+# Sin Flask-Migrate: las migraciones se corren con `flask db upgrade`, no desde el servidor
+application = create_app(migrate=False)
 
 if __name__ == "__main__":
     application.run()